@@ -0,0 +1,61 @@
+"""
+Benchmark: batchimport av flera CSV-filer med olika antal processer
+
+Startar backend med uvicorn mot en ny temporär databas för varje körning
+och importerar samma filer via POST /api/transactions/import-batch.
+Parsningen skalar med antalet kärnor, skrivningen sker alltid i en process.
+
+    cd backend && python benchmarks/bench_batch_import.py --files 8 --rows 25000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import httpx
+
+from load_import_reads import generate_csv, free_port, start_server
+
+
+def run(files, workers: int):
+    workdir = tempfile.mkdtemp()
+    port = free_port()
+    server = start_server(port, workdir)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1200) as client:
+            started = time.perf_counter()
+            response = client.post(
+                '/api/transactions/import-batch',
+                params={'workers': workers},
+                files=[('files', (f"{i}.csv", content, 'text/csv')) for i, content in enumerate(files)]
+            )
+            seconds = time.perf_counter() - started
+            response.raise_for_status()
+            return seconds, response.json()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=25000, help='Rader per fil')
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    files = [generate_csv(args.rows, seed=i + 1) for i in range(args.files)]
+    print(f"{args.files} filer x {args.rows} rader, {os.cpu_count()} kärnor")
+
+    for workers in args.workers:
+        seconds, body = run(files, workers)
+        timings = body['timings']
+        print(
+            f"workers={body['workers']:<3} {seconds:6.1f} s  importerade={body['imported']:<8}"
+            f" parse(cpu)={timings.get('parse_cpu', 0):8.0f} ms  import(vägg)={timings.get('wall', 0):8.0f} ms"
+            f"  insert={timings.get('insert', 0):7.0f} ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
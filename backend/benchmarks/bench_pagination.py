@@ -0,0 +1,108 @@
+"""
+Benchmark: sidlatens för GET /api/transactions/ med skip respektive cursor
+
+Skapar en temporär databas med syntetiska transaktioner och mäter hur lång
+tid en sida tar på olika djup i historiken.
+
+    cd backend && python benchmarks/bench_pagination.py --rows 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(rows: int):
+    """Fyll databasen med syntetiska transaktioner (ungefär var tredje okategoriserad)"""
+    from sqlalchemy import insert
+    from database import SessionLocal
+    from models.database import Category, Transaction
+
+    db = SessionLocal()
+    category_ids = [category.id for category in db.query(Category).all()]
+    start = datetime(2015, 1, 1)
+    random.seed(1)
+
+    batch = []
+    for i in range(rows):
+        batch.append({
+            'date': start + timedelta(minutes=random.randint(0, 10 * 365 * 24 * 60)),
+            'description': f"BUTIK {i % 5000}",
+            'amount': round(random.uniform(-2000, 500), 2),
+            'category_id': random.choice(category_ids) if random.random() > 0.3 else None,
+            'import_hash': f"bench{i}",
+        })
+        if len(batch) == 10000:
+            db.execute(insert(Transaction.__table__), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Transaction.__table__), batch)
+
+    db.commit()
+    db.close()
+
+
+def time_page(client, params, repeat):
+    timings = []
+    response = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get('/api/transactions/', params=params)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(timings), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--depths', type=int, nargs='+', default=[0, 1000, 10000, 50000, 90000])
+    parser.add_argument('--uncategorized', action='store_true', help='Mät filtret uncategorized=true')
+    args = parser.parse_args()
+
+    # Databasen skapas relativt arbetskatalogen (sqlite:///./budget.db)
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        seed(args.rows)
+
+        base = {'limit': args.limit}
+        if args.uncategorized:
+            base['uncategorized'] = True
+
+        print(f"{args.rows} transaktioner, {args.limit} per sida, median av {args.repeat}")
+        print(f"{'djup':>8} {'skip (ms)':>10} {'cursor (ms)':>12}")
+
+        for depth in args.depths:
+            skip_ms, skip_response = time_page(client, {**base, 'skip': depth}, args.repeat)
+
+            # Cursor till samma position: hämta raden strax före sidan
+            cursor = None
+            if depth > 0:
+                previous = client.get('/api/transactions/', params={**base, 'skip': depth - 1, 'limit': 1})
+                cursor = previous.headers.get('X-Next-Cursor')
+                if cursor is None:
+                    print(f"{depth:>8} {skip_ms:>10.2f} {'-':>12}")
+                    continue
+
+            cursor_params = {**base, 'cursor': cursor} if cursor else base
+            cursor_ms, cursor_response = time_page(client, cursor_params, args.repeat)
+
+            assert skip_response.json() == cursor_response.json(), f"Olika resultat på djup {depth}"
+            print(f"{depth:>8} {skip_ms:>10.2f} {cursor_ms:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
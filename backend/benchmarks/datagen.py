@@ -0,0 +1,194 @@
+"""
+Generator för realistiska SEB-exporter till benchmarks
+
+Raderna liknar en riktig kontohistorik: lön och fasta kostnader varje
+månad, återkommande butiker med butiksnummer och ort, och en lång svans
+av sällsynta beskrivningar. Belopp och saldo skrivs i svenskt format
+(decimalkomma, mellanslag som tusentalsavgränsare) och filen är sorterad
+nyast först som SEB:s export.
+
+    cd backend && python benchmarks/datagen.py --rows 100000 --years 5 > seb.csv
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+HEADER = "Bokföringsdatum;Valutadatum;Verifikationsnummer;Text/Beteckning;Belopp;Saldo"
+
+# Tusentalsavgränsare som förekommer i exporter (vanligt och hårt mellanslag)
+THOUSANDS_SEPARATORS = {'space': ' ', 'nbsp': '\xa0', 'none': ''}
+
+CITIES = ['STOCKHOLM', 'GOTEBORG', 'MALMO', 'UPPSALA', 'VASTERAS', 'OREBRO', 'LINKOPING', 'UMEA', 'LUND', 'SOLNA']
+
+# (beskrivning, kategori i standardkategorierna, beloppsintervall, vikt)
+CHAINS = [
+    ('ICA NARA', 'Mat', (-900, -40), 30),
+    ('ICA KVANTUM', 'Mat', (-2500, -150), 12),
+    ('COOP KONSUM', 'Mat', (-1200, -50), 15),
+    ('WILLYS', 'Mat', (-1800, -100), 12),
+    ('LIDL', 'Mat', (-900, -40), 8),
+    ('HEMKOP', 'Mat', (-700, -30), 6),
+    ('SL', 'Transport', (-970, -39), 10),
+    ('CIRCLE K', 'Transport', (-900, -200), 5),
+    ('PREEM', 'Transport', (-900, -200), 4),
+    ('SJ AB', 'Transport', (-1400, -195), 2),
+    ('H&M', 'Shopping', (-1500, -99), 4),
+    ('CLAS OHLSON', 'Shopping', (-800, -29), 3),
+    ('IKEA', 'Shopping', (-6000, -49), 2),
+    ('APOTEK HJARTAT', 'Hälsa', (-600, -29), 3),
+    ('APOTEKET', 'Hälsa', (-500, -25), 2),
+    ('MAX HAMBURGARE', 'Restaurang', (-250, -79), 5),
+    ('SUSHI YAMA', 'Restaurang', (-400, -99), 3),
+    ('ESPRESSO HOUSE', 'Restaurang', (-150, -35), 6),
+    ('SF BIO', 'Nöje', (-400, -129), 2),
+    ('SYSTEMBOLAGET', 'Nöje', (-1200, -89), 4),
+]
+
+# (beskrivning, kategori, belopp, dag i månaden)
+MONTHLY = [
+    ('LON', 'Lön', 34500.0, 25),
+    ('HYRA BOSTADSRATT', 'Hyra/Boende', -4850.0, 28),
+    ('BOLAN RANTA', 'Bolån', -6120.0, 28),
+    ('VATTENFALL', 'El', -612.0, 27),
+    ('TELIA BREDBAND', 'Internet', -449.0, 27),
+    ('IF SKADEFORSAKRING', 'Försäkringar', -318.0, 1),
+    ('SPOTIFY', 'Nöje', -119.0, 3),
+    ('NETFLIX.COM', 'Nöje', -149.0, 5),
+]
+
+
+def build_merchants(count: int, seed: int = 1) -> List[Tuple[str, str, Tuple[int, int], int]]:
+    """
+    count butiker (beskrivning, kategori, beloppsintervall, vikt) byggda på
+    kedjorna ovan med butiksnummer och ort. Vikterna följer ungefär Zipf,
+    några butiker står för de flesta köpen.
+    """
+    rng = random.Random(seed)
+    merchants = []
+    for i in range(count):
+        chain, category, amounts, weight = CHAINS[i % len(CHAINS)]
+        store = i // len(CHAINS)
+        description = f"{chain} {rng.choice(CITIES)}" if store == 0 else f"{chain} {store} {rng.choice(CITIES)}"
+        merchants.append((description, category, amounts, weight / (1 + store)))
+    return merchants
+
+
+def generate_rules(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    count regler (kategorinamn, mönster, typ) av samma slag som användaren
+    skapar: kedjenamn och hela butiksbeskrivningar, var tionde som regex
+    """
+    rng = random.Random(seed)
+    rules = []
+    for description, category, _, _ in MONTHLY:
+        rules.append({'category': category, 'pattern': description, 'pattern_type': 'substring'})
+    for chain, category, _, _ in CHAINS:
+        rules.append({'category': category, 'pattern': chain, 'pattern_type': 'substring'})
+
+    i = 0
+    while len(rules) < count:
+        chain, category, _, _ = CHAINS[i % len(CHAINS)]
+        if i % 10 == 9:
+            pattern = f"^{chain} {i // len(CHAINS)} (" + "|".join(rng.sample(CITIES, 3)) + ")$"
+            rules.append({'category': category, 'pattern': pattern, 'pattern_type': 'regex'})
+        else:
+            rules.append({'category': category, 'pattern': f"{chain} {i // len(CHAINS) + 1} ", 'pattern_type': 'substring'})
+        i += 1
+
+    return rules[:count]
+
+
+def format_amount(value: float, thousands: str = ' ') -> str:
+    """Svenskt beloppsformat: -1 234,50"""
+    sign = '-' if value < 0 else ''
+    whole, cents = divmod(round(abs(value) * 100), 100)
+    return f"{sign}{whole:,}".replace(',', thousands) + f",{cents:02d}"
+
+
+def generate_rows(rows: int, years: int = 5, merchants: int = 500, seed: int = 1,
+                  end: date = date(2024, 12, 31)) -> List[Tuple[date, str, float]]:
+    """
+    rows transaktioner (datum, beskrivning, belopp) jämnt fördelade över
+    years år fram till end, äldst först. Var tjugonde köp har en unik
+    beskrivning (Swish, autogiro), resten är månadsposter och butiker.
+    """
+    rng = random.Random(seed)
+    start = end - timedelta(days=365 * years)
+    days = (end - start).days + 1
+
+    months = []
+    month = date(start.year, start.month, 1)
+    while month <= end:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+
+    # Månadsposterna först, så att de finns oavsett antal rader
+    result = []
+    for month in months:
+        for description, _, amount, day in MONTHLY:
+            booked = month.replace(day=day)
+            if start <= booked <= end:
+                result.append((booked, description, amount))
+    result = result[:max(rows - len(months), 0)]
+
+    stores = build_merchants(merchants, seed)
+    weights = [weight for _, _, _, weight in stores]
+    picks = rng.choices(stores, weights=weights, k=max(rows - len(months) - len(result), 0))
+    for i, (description, _, (low, high), _) in enumerate(picks):
+        booked = start + timedelta(days=rng.randrange(days))
+        if i % 20 == 19:
+            description = rng.choice(['SWISH TILL', 'AUTOGIRO', 'KORTKOP']) + f" {rng.randrange(10 ** 8):08d}"
+        result.append((booked, description, round(rng.uniform(low, high), 2)))
+
+    # En överföring till/från sparkontot sista dagen varje månad nollar
+    # månadens netto, så saldot ligger kvar kring ingående saldo även med
+    # tusentals köp per månad
+    net_by_month = dict.fromkeys(months, 0.0)
+    for booked, _, amount in result:
+        net_by_month[booked.replace(day=1)] += amount
+    for month, net in list(net_by_month.items())[:rows - len(result)]:
+        last_day = min((month + timedelta(days=32)).replace(day=1) - timedelta(days=1), end)
+        result.append((last_day, 'OVERFORING SPARKONTO', round(-net, 2)))
+
+    result.sort(key=lambda row: row[0])
+    return result
+
+
+def generate_csv(rows: int, years: int = 5, merchants: int = 500, seed: int = 1,
+                 thousands: str = ' ', opening_balance: float = 25000.0) -> str:
+    """SEB-CSV med löpande saldo, nyast först"""
+    transactions = generate_rows(rows, years, merchants, seed)
+
+    balance = opening_balance
+    lines = []
+    for number, (booked, description, amount) in enumerate(transactions):
+        balance += amount
+        day = booked.isoformat()
+        lines.append(
+            f"{day};{day};{5_000_000 + number};{description};"
+            f"{format_amount(amount, thousands)};{format_amount(balance, thousands)}"
+        )
+
+    lines.append(HEADER)
+    lines.reverse()
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--merchants', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--thousands', choices=sorted(THOUSANDS_SEPARATORS), default='space')
+    args = parser.parse_args()
+
+    sys.stdout.write(generate_csv(
+        args.rows, args.years, args.merchants, args.seed, THOUSANDS_SEPARATORS[args.thousands]
+    ))
+
+
+if __name__ == '__main__':
+    main()
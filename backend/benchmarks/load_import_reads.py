@@ -0,0 +1,137 @@
+"""
+Lasttest: läslatens medan en stor CSV-import pågår
+
+Startar backend med uvicorn (en worker) mot en temporär databas, mäter
+latensen för dashboardens läsningar i vila och sedan medan en import med
+många rader körs i en annan tråd.
+
+    cd backend && python benchmarks/load_import_reads.py --rows 50000
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_ENDPOINTS = [
+    ('/api/periods/current', {}),
+    ('/api/periods/list', {'limit': 12}),
+    ('/api/transactions/', {'limit': 50}),
+]
+
+
+def generate_csv(rows: int, seed: int = 1) -> bytes:
+    """SEB-liknande CSV med slumpade rader"""
+    random.seed(seed)
+    lines = ["Bokföringsdatum;Valutadatum;Verifikationsnummer;Text/Beteckning;Belopp;Saldo"]
+    for i in range(rows):
+        date = f"20{random.randint(15, 24)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        amount = f"-{random.randint(1, 9999)},{random.randint(0, 99):02d}"
+        lines.append(f"{date};{date};{i};BUTIK {random.randint(0, 1999)} STOCKHOLM {i};{amount};1 000,00")
+    return "\n".join(lines).encode('utf-8')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workdir: str) -> subprocess.Popen:
+    env = {**os.environ, 'SQLALCHEMY_DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'budget.db')}"}
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env
+    )
+
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError("Servern startade inte")
+
+
+def measure_reads(client: httpx.Client, stop: threading.Event, min_requests: int = 0):
+    """Läs i en loop tills stop sätts, returnera latenser i ms"""
+    latencies = []
+    while not stop.is_set() or len(latencies) < min_requests:
+        path, params = READ_ENDPOINTS[len(latencies) % len(READ_ENDPOINTS)]
+        started = time.perf_counter()
+        response = client.get(path, params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return latencies
+
+
+def describe(label: str, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(
+        f"{label:<16} n={len(latencies):<5} median={statistics.median(latencies):7.1f} ms"
+        f"  p95={p95:7.1f} ms  max={latencies[-1]:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--baseline-requests', type=int, default=60)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    content = generate_csv(args.rows)
+
+    server = start_server(port, workdir)
+    try:
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            # Lite data så att läsningarna har något att göra
+            client.post('/api/transactions/import', files={'file': ('seed.csv', generate_csv(2000, seed=2), 'text/csv')})
+
+            stop = threading.Event()
+            stop.set()
+            describe('i vila', measure_reads(client, stop, args.baseline_requests))
+
+            result = {}
+
+            def run_import():
+                with httpx.Client(base_url=base_url, timeout=600) as import_client:
+                    started = time.perf_counter()
+                    response = import_client.post(
+                        '/api/transactions/import',
+                        files={'file': ('bench.csv', content, 'text/csv')}
+                    )
+                    result['seconds'] = time.perf_counter() - started
+                    result['body'] = response.json()
+                stop.set()
+
+            stop.clear()
+            importer = threading.Thread(target=run_import)
+            importer.start()
+            latencies = measure_reads(client, stop)
+            importer.join()
+
+            describe('under import', latencies)
+            print(f"Import: {result['body'].get('imported')} rader på {result['seconds']:.1f} s")
+            print(f"Faser (ms): {result['body'].get('timings')}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Benchmarksvit: import, kategorisering och läsningar på 1k/100k/1M rader
+
+Varje storlek körs i en egen process mot en ny temporär databas, med data
+från datagen.py. Resultatet skrivs som JSON så att två versioner kan
+jämföras (--compare), t.ex. före och efter en ändring:
+
+    cd backend && python benchmarks/run_suite.py --output before.json
+    cd backend && python benchmarks/run_suite.py --output after.json --compare before.json
+    cd backend && python benchmarks/run_suite.py --sizes 1000000 --repeat 1
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = [1000, 100000]
+
+# Tillåten försämring (andel av median) innan --compare räknar det som en regression
+DEFAULT_THRESHOLD = 0.2
+
+# Skillnader under en millisekund är brus, inte regressioner
+MIN_REGRESSION_MS = 1.0
+
+
+def measure(name: str, rows: int, repeat: int, run: Callable[[], Any], setup: Callable[[], Any] = None) -> Dict[str, Any]:
+    """Kör run repeat gånger (setup före varje körning, otajmad) och sammanfatta tiderna"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'name': name,
+        'rows': rows,
+        'repeat': repeat,
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def run_size(rows: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Alla benchmarks för en storlek. Körs i en egen process (se main)."""
+    # Databasen skapas relativt arbetskatalogen (sqlite:///./budget.db)
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, BENCHMARK_DIR)
+
+    from fastapi.testclient import TestClient
+    from datagen import generate_csv, generate_rules
+    from database import SessionLocal
+    from main import app
+    from models.database import Category
+    from routers.periods import _get_period_summary, _get_period_trends
+    from services.period_calculator import PeriodCalculator
+    from services.categorizer import TransactionCategorizer
+    from services.csv_parser import parse_seb_csv
+    from services.rule_cache import bump_rules_version
+    from services.transaction_columns import forget_transaction_columns, get_transaction_columns
+
+    content = generate_csv(rows, args.years, args.merchants)
+    descriptions = [line.split(';')[3] for line in content.splitlines()[1:]]
+    results = []
+
+    def check(response):
+        assert response.status_code == 200, response.text
+        return response
+
+    repeat = args.repeat
+    results.append(measure('parse_seb_csv', rows, repeat, lambda: parse_seb_csv(content)))
+
+    with TestClient(app) as client:
+        db = SessionLocal()
+        category_ids = {category.name: category.id for category in db.query(Category).all()}
+        for rule in generate_rules(args.rules):
+            check(client.post('/api/categories/rules', json={
+                'category_id': category_ids[rule['category']],
+                'pattern': rule['pattern'],
+                'pattern_type': rule['pattern_type'],
+            }))
+
+        # Ny regelmatchning före varje körning, annars mäts bara memot
+        categorizer = {}
+
+        def new_categorizer():
+            bump_rules_version()
+            categorizer['current'] = TransactionCategorizer(db)
+
+        results.append(measure(
+            'categorize', rows, repeat,
+            lambda: [categorizer['current'].categorize(description) for description in descriptions],
+            setup=new_categorizer
+        ))
+        results.append(measure(
+            'categorize_many', rows, repeat,
+            lambda: categorizer['current'].categorize_many(descriptions),
+            setup=new_categorizer
+        ))
+
+        # Importen mäts en gång (därefter finns raderna), sedan som ren dubblettimport
+        files = {'file': ('seb.csv', content.encode('utf-8'), 'text/csv')}
+        results.append(measure('import', rows, 1, lambda: check(client.post('/api/transactions/import', files=files))))
+        results.append(measure(
+            'import_duplicates', rows, repeat, lambda: check(client.post('/api/transactions/import', files=files))
+        ))
+
+        # Godtyckligt intervall (inte en hel löneperiod): senaste året i datan
+        end_date = datetime(2024, 12, 31, 23, 59, 59)
+        start_date = end_date - timedelta(days=365)
+        results.append(measure(
+            'period_summary_year', rows, repeat, lambda: _get_period_summary(db, start_date, end_date)
+        ))
+        results.append(measure(
+            'columns_load', rows, repeat, lambda: get_transaction_columns(db), setup=forget_transaction_columns
+        ))
+        columns = get_transaction_columns(db)
+        results.append(measure(
+            'columns_totals_all', rows, repeat,
+            lambda: columns.category_totals(datetime(1970, 1, 1), datetime(2100, 1, 1))
+        ))
+        # Direkt mot funktionen, endpointen svarar från svarscachen efter första anropet
+        calc = PeriodCalculator()
+        trend_bounds = [calc.get_period_for_date(end_date)]
+        for _ in range(59):
+            trend_bounds.insert(0, calc.get_previous_period(trend_bounds[0][0]))
+        results.append(measure(
+            'period_trends_60', rows, repeat, lambda: _get_period_trends(db, calc, trend_bounds)
+        ))
+        results.append(measure(
+            'list_periods', rows, repeat, lambda: check(client.get('/api/periods/list', params={'limit': 12}))
+        ))
+        results.append(measure(
+            'list_periods_60', rows, repeat, lambda: check(client.get('/api/periods/list', params={'limit': 60}))
+        ))
+
+        page = {'limit': 100}
+        depth = max(rows * 9 // 10 - 1, 0)
+        cursor = check(client.get('/api/transactions/', params={'skip': depth, 'limit': 1})).headers.get('X-Next-Cursor')
+        results.append(measure(
+            'transactions_first_page', rows, repeat, lambda: check(client.get('/api/transactions/', params=page))
+        ))
+        results.append(measure(
+            'transactions_deep_skip', rows, repeat,
+            lambda: check(client.get('/api/transactions/', params={**page, 'skip': depth}))
+        ))
+        if cursor:
+            results.append(measure(
+                'transactions_deep_cursor', rows, repeat,
+                lambda: check(client.get('/api/transactions/', params={**page, 'cursor': cursor}))
+            ))
+
+        db.close()
+
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> int:
+    """Skriv median före/efter per benchmark. Returnerar antal regressioner."""
+    before = {(result['name'], result['rows']): result for result in baseline}
+    regressions = 0
+
+    print(f"{'benchmark':<26} {'rader':>8} {'före (ms)':>11} {'efter (ms)':>11} {'kvot':>6}")
+    for result in results:
+        old = before.get((result['name'], result['rows']))
+        if old is None:
+            print(f"{result['name']:<26} {result['rows']:>8} {'-':>11} {result['median_ms']:>11.2f} {'-':>6}")
+            continue
+
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold and result['median_ms'] - old['median_ms'] >= MIN_REGRESSION_MS:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(
+            f"{result['name']:<26} {result['rows']:>8} {old['median_ms']:>11.2f} "
+            f"{result['median_ms']:>11.2f} {ratio:>6.2f}{flag}"
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Antal rader, t.ex. 1000 100000 1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--merchants', type=int, default=500)
+    parser.add_argument('--rules', type=int, default=200)
+    parser.add_argument('--output', help='Skriv resultatet som JSON till filen')
+    parser.add_argument('--compare', help='JSON från en tidigare körning att jämföra mot')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        results = run_size(args.worker, args)
+        with open(args.output, 'w') as f:
+            json.dump(results, f)
+        return
+
+    # En process per storlek: ny databas och inga cachar kvar från förra storleken
+    results = []
+    for rows in args.sizes:
+        print(f"{rows} rader...", file=sys.stderr)
+        with tempfile.NamedTemporaryFile(suffix='.json') as worker_output:
+            command = [
+                sys.executable, os.path.abspath(__file__), '--worker', str(rows), '--output', worker_output.name,
+                '--repeat', str(args.repeat), '--years', str(args.years),
+                '--merchants', str(args.merchants), '--rules', str(args.rules)
+            ]
+            if subprocess.run(command).returncode != 0:
+                sys.exit(f"Benchmark för {rows} rader misslyckades")
+            results.extend(json.load(open(worker_output.name)))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': args.repeat,
+            'years': args.years,
+            'merchants': args.merchants,
+            'rules': args.rules,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
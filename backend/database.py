@@ -1,14 +1,25 @@
-from sqlalchemy import create_engine
+import os
+import shutil
+import sqlite3
+from sqlalchemy import Float, Integer, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./budget.db"
+from db_config import DEFAULT_DATABASE_URL, get_database_url, create_configured_engine, create_configured_async_engine, sqlite_path
+
+SQLALCHEMY_DATABASE_URL = get_database_url()
+
+# Pragmas (WAL m.m.) och SQL-funktioner sätts per anslutning, se db_config.py
+engine = create_configured_engine(SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async-stack (aiosqlite) för endpoints som inte får blockera event-loopen
+async_engine = create_configured_async_engine(SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -21,7 +32,164 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency för att få en async databas-session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Tabeller med enbart härledd data. Har de ett äldre schema tas de bort
+# och skapas om, innehållet byggs sedan om från transaktionerna.
+CACHE_TABLES = ["period_categories", "periods"]
+
+
 def init_db():
     """Initialisera databasen och skapa tabeller"""
     from models import database as models  # Import här för att undvika cirkulära imports
+    _move_legacy_database()
+    _record_import_hash_format()
+    _drop_outdated_cache_tables()
+    _convert_money_columns()
     Base.metadata.create_all(bind=engine)
+    _create_missing_indexes()
+
+    from services.search import ensure_search_index
+    from services.suggestions import ensure_suggestion_triggers
+    with engine.begin() as connection:
+        ensure_search_index(connection)
+        ensure_suggestion_triggers(connection)
+
+
+def _move_legacy_database():
+    """
+    Flytta databasen från standardplatsen om den konfigurerade saknas
+    Äldre versioner ignorerade SQLALCHEMY_DATABASE_URL och använde alltid
+    ./budget.db. Med URL:en från docker-compose*.yml (./data/budget.db)
+    skulle en uppgraderad installation annars starta med en tom databas.
+    """
+    path = sqlite_path(SQLALCHEMY_DATABASE_URL)
+    legacy_path = sqlite_path(DEFAULT_DATABASE_URL)
+    if path is None or os.path.exists(path) or not os.path.exists(legacy_path):
+        return
+
+    # Skriv in WAL-filen i databasfilen så att bara den behöver flyttas
+    connection = sqlite3.connect(legacy_path)
+    try:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        connection.close()
+
+    # Kopieras till en temporär fil först, ett avbrott lämnar aldrig en halv databas på path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.moving"
+    shutil.copy2(legacy_path, temporary)
+    os.replace(temporary, path)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(legacy_path + suffix):
+            os.remove(legacy_path + suffix)
+
+    print(f"Flyttade databasen från {legacy_path} till {path} (SQLALCHEMY_DATABASE_URL)")
+
+
+def _record_import_hash_format():
+    """
+    Markera i PRAGMA user_version om databasen kan ha äldre import_hash
+    Sätts en gång: hade databasen redan transaktioner kan några vara
+    importerade före öreskodningen, en ny databas har bara den nya hashen
+    och importen slipper då slå upp den gamla (se services/importer.py).
+    """
+    from services.importer import IMPORT_HASHES_MIXED, IMPORT_HASHES_ORE
+
+    with engine.begin() as connection:
+        if connection.execute(text("PRAGMA user_version")).scalar():
+            return
+
+        has_rows = (
+            inspect(connection).has_table("transactions")
+            and connection.execute(text("SELECT 1 FROM transactions LIMIT 1")).first() is not None
+        )
+        connection.execute(text(f"PRAGMA user_version = {IMPORT_HASHES_MIXED if has_rows else IMPORT_HASHES_ORE}"))
+
+
+def _drop_outdated_cache_tables():
+    """Ta bort cache-tabeller som saknar kolumner i nuvarande modell"""
+    inspector = inspect(engine)
+
+    for table_name in CACHE_TABLES:
+        if not inspector.has_table(table_name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        expected = {column.name for column in Base.metadata.tables[table_name].columns}
+
+        if not expected <= existing or _money_columns_to_convert(inspector, table_name):
+            tables = [Base.metadata.tables[name] for name in CACHE_TABLES]
+            Base.metadata.drop_all(bind=engine, tables=tables)
+            return
+
+
+def _money_columns_to_convert(inspector, table_name: str) -> list:
+    """Beloppskolumner (models.money.Money) vars lagring i databasen inte är den valda"""
+    from models.money import Money, STORED_IN_ORE
+
+    stored = {column["name"]: column["type"] for column in inspector.get_columns(table_name)}
+    return [
+        column.name
+        for column in Base.metadata.tables[table_name].columns
+        if isinstance(column.type, Money)
+        and column.name in stored
+        and isinstance(stored[column.name], Integer) != STORED_IN_ORE
+        and isinstance(stored[column.name], (Integer, Float))
+    ]
+
+
+def _convert_money_columns():
+    """
+    Konvertera beloppskolumner när BUDGET_MONEY_STORAGE har ändrats
+    Kolumntypen (REAL/INTEGER) kan inte ändras med ALTER TABLE i SQLite, så
+    tabellen byggs om: ny tabell med nuvarande schema, kopiera raderna med
+    omräknade belopp (id:n behålls), ta bort den gamla och byt namn.
+    Index skapas av _create_missing_indexes och triggers av init_db.
+    Cache-tabellerna konverteras inte, de byggs om (_drop_outdated_cache_tables).
+    """
+    from models.money import STORED_IN_ORE
+
+    inspector = inspect(engine)
+    tables = [
+        table for table in Base.metadata.sorted_tables
+        if table.name not in CACHE_TABLES and inspector.has_table(table.name)
+    ]
+
+    for table in tables:
+        columns = _money_columns_to_convert(inspector, table.name)
+        if not columns:
+            continue
+
+        new_name = f"{table.name}_money_migration"
+        create = str(CreateTable(table).compile(bind=engine)).replace(
+            f"CREATE TABLE {table.name} ", f"CREATE TABLE {new_name} ", 1
+        )
+        stored = {column["name"] for column in inspector.get_columns(table.name)}
+        names = [column.name for column in table.columns if column.name in stored]
+        values = [
+            (f"CAST(ROUND({name} * 100) AS INTEGER)" if STORED_IN_ORE else f"{name} / 100.0")
+            if name in columns else name
+            for name in names
+        ]
+
+        with engine.begin() as connection:
+            connection.execute(text(create))
+            connection.execute(text(
+                f"INSERT INTO {new_name} ({', '.join(names)}) SELECT {', '.join(values)} FROM {table.name}"
+            ))
+            connection.execute(text(f"DROP TABLE {table.name}"))
+            connection.execute(text(f"ALTER TABLE {new_name} RENAME TO {table.name}"))
+
+        print(f"Konverterade {', '.join(columns)} i {table.name} till {'ören' if STORED_IN_ORE else 'kronor'}")
+
+
+def _create_missing_indexes():
+    """Skapa index som lagts till i modellerna efter att tabellen skapades"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,141 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+
+# Databasens URL, kan sättas via miljövariabel (se docker-compose*.yml)
+DEFAULT_DATABASE_URL = "sqlite:///./budget.db"
+
+# Pragmas per hårdvaruprofil, väljs med BUDGET_DB_PROFILE.
+# Gemensamt: WAL så att läsningar inte blockeras av en pågående import,
+# och synchronous=NORMAL som i WAL-läge bara riskerar sista commiten vid strömavbrott.
+DB_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Raspberry Pi med SD-kort: lite RAM, långsam och slitkänslig slumpvis skrivning
+    "rpi": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16000,  # Negativt värde = KiB, dvs ~16 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 15000,  # ms, SD-kort kan ha långa fsync
+        "wal_autocheckpoint": 4000,  # Färre men större checkpoints
+    },
+    # SSD/vanlig server
+    "ssd": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,  # ~64 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 1000,
+    },
+}
+
+DEFAULT_PROFILE = "ssd"
+
+# Lagring av belopp, väljs med BUDGET_MONEY_STORAGE:
+# "float" = REAL i kronor (som tidigare), "ore" = heltal i ören (exakta summor).
+# Befintliga tabeller konverteras vid start när inställningen ändras (se database.py).
+MONEY_STORAGES = ("float", "ore")
+DEFAULT_MONEY_STORAGE = "float"
+
+
+def get_database_url() -> str:
+    """Databasens URL från SQLALCHEMY_DATABASE_URL eller standard"""
+    return os.environ.get("SQLALCHEMY_DATABASE_URL", DEFAULT_DATABASE_URL)
+
+
+def get_profile_name() -> str:
+    """Vald pragma-profil från BUDGET_DB_PROFILE"""
+    name = os.environ.get("BUDGET_DB_PROFILE", DEFAULT_PROFILE).lower()
+    if name not in DB_PROFILES:
+        raise ValueError(f"Okänd BUDGET_DB_PROFILE '{name}', välj en av: {', '.join(DB_PROFILES)}")
+    return name
+
+
+def get_money_storage() -> str:
+    """Vald beloppslagring från BUDGET_MONEY_STORAGE"""
+    name = os.environ.get("BUDGET_MONEY_STORAGE", DEFAULT_MONEY_STORAGE).lower()
+    if name not in MONEY_STORAGES:
+        raise ValueError(f"Okänd BUDGET_MONEY_STORAGE '{name}', välj en av: {', '.join(MONEY_STORAGES)}")
+    return name
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def sqlite_path(url: str) -> Optional[str]:
+    """Filen för en SQLite-URL, None för andra databaser och minnesdatabaser"""
+    if not is_sqlite(url):
+        return None
+    database = make_url(url).database
+    return database if database and database != ":memory:" else None
+
+
+def create_configured_engine(url: Optional[str] = None, profile: Optional[str] = None) -> Engine:
+    """Skapa engine med URL och pragmas enligt konfigurationen"""
+    url = url or get_database_url()
+
+    if not is_sqlite(url):
+        return create_engine(url)
+
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    install_sqlite_setup(engine, DB_PROFILES[profile or get_profile_name()])
+    return engine
+
+
+def to_async_url(url: str) -> str:
+    """Byt SQLite-drivrutinen mot aiosqlite (sqlite:///x.db -> sqlite+aiosqlite:///x.db)"""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def create_configured_async_engine(url: Optional[str] = None, profile: Optional[str] = None) -> AsyncEngine:
+    """Async-engine (aiosqlite) mot samma databas, med samma pragmas"""
+    url = url or get_database_url()
+
+    if not is_sqlite(url):
+        return create_async_engine(url)
+
+    engine = create_async_engine(to_async_url(url))
+    install_sqlite_setup(engine.sync_engine, DB_PROFILES[profile or get_profile_name()])
+    return engine
+
+
+def install_sqlite_setup(engine: Engine, pragmas: Dict[str, Any]):
+    """Sätt pragmas och registrera SQL-funktioner på varje ny anslutning"""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+        # SQLites lower() hanterar bara ASCII, py_lower används för å/ä/ö
+        dbapi_connection.create_function("py_lower", 1, _lower, deterministic=True)
+        # py_regexp(pattern, text): skiftlägesokänslig re.search som regex-reglerna
+        dbapi_connection.create_function("py_regexp", 2, _regexp, deterministic=True)
+
+
+def _lower(value):
+    return value.lower() if value is not None else None
+
+
+@lru_cache(maxsize=256)
+def _compile_regexp(pattern: str) -> re.Pattern:
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _regexp(pattern, value):
+    if pattern is None or value is None:
+        return None
+    return 1 if _compile_regexp(pattern).search(value) else 0
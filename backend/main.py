@@ -1,8 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from database import init_db, get_db
-from routers import transactions, categories, periods, loans, savings
+from routers import transactions, categories, periods, loans, savings, jobs
 from models.database import Category
+from services.period_rollup import ensure_rollup
+from services.classifier import flush_category_model, load_category_model
+from services.jobs import resume_jobs, shutdown_jobs
+from services.batch_import import shutdown_import_pool
+from services.metrics import CONTENT_TYPE, MetricsMiddleware, install_sql_hooks, render_metrics
+from services.data_version import install_version_hooks
+from services.transaction_columns import install_column_hooks
 from sqlalchemy.orm import Session
 
 app = FastAPI(
@@ -18,14 +26,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "X-DB-Queries", "ETag", "Last-Modified"],
 )
 
+# Svarstider, SQL-frågor per request och profilering (se /metrics)
+app.add_middleware(MetricsMiddleware)
+install_sql_hooks()
+
+# Dataversioner per tabellfamilj, för ETags och svarscachen (se services/http_cache.py)
+install_version_hooks()
+
+# Kolumnbilden av transaktionerna hålls aktuell med de id:n som ändras
+install_column_hooks()
+
 # Inkludera routers
 app.include_router(transactions.router)
 app.include_router(categories.router)
 app.include_router(periods.router)
 app.include_router(loans.router)
 app.include_router(savings.router)
+app.include_router(jobs.router)
 
 
 @app.on_event("startup")
@@ -37,8 +57,32 @@ def startup_event():
     # Skapa default-kategorier om de inte finns
     db = next(get_db())
     create_default_categories(db)
+
+    # Bygg periodsummeringen om den saknas (t.ex. efter uppgradering)
+    ensure_rollup(db)
+
+    # Läs kategoriseringsmodellen (tränas om från databasen om den saknas)
+    load_category_model(db)
     db.close()
 
+    # Fortsätt bakgrundsjobb som avbröts av förra avstängningen
+    resumed = resume_jobs()
+    if resumed:
+        print(f"Återupptar {resumed} bakgrundsjobb")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Kör vid avstängning"""
+    # Pågående jobb stannar efter aktuell batch och återupptas vid nästa start
+    shutdown_jobs()
+
+    # Processpoolen för batchimport
+    shutdown_import_pool()
+
+    # Manuella ändringar av kategoriseringsmodellen som inte hunnit sparas
+    flush_category_model()
+
 
 @app.get("/")
 def root():
@@ -54,6 +98,12 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Mätvärden i Prometheus-format"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
 def create_default_categories(db: Session):
     """Skapa default-kategorier om databasen är tom"""
     existing = db.query(Category).count()
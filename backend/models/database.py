@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+from models.money import Money
 
 
 class Category(Base):
@@ -40,8 +41,8 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False, index=True)
     description = Column(String, nullable=False)
-    amount = Column(Float, nullable=False)
-    balance = Column(Float, nullable=True)  # Saldo efter transaktion
+    amount = Column(Money, nullable=False)
+    balance = Column(Money, nullable=True)  # Saldo efter transaktion
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     account_name = Column(String, default="SEB")  # För framtida multi-account support
 
@@ -54,6 +55,27 @@ class Transaction(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     category = relationship("Category", back_populates="transactions")
+    # Underhålls av services/suggestions.py (bulk-insert och triggers), därför viewonly
+    suggestions = relationship("TransactionSuggestion", order_by="TransactionSuggestion.rank", viewonly=True)
+
+    __table_args__ = (
+        # Filtrering på kategori inom ett datumintervall
+        Index("ix_transactions_category_date", "category_id", "date"),
+        # Keyset-paginering sorterad på (date, id)
+        Index("ix_transactions_date_id", "date", "id"),
+        # Okategoriserade transaktioner (partiellt index, bara de rader som saknar kategori)
+        Index("ix_transactions_uncategorized", "date", "id", sqlite_where=category_id.is_(None)),
+    )
+
+
+class TransactionSuggestion(Base):
+    """Kategoriförslag (topp 3) för okategoriserade transaktioner, se services/suggestions.py"""
+    __tablename__ = "transaction_suggestions"
+
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 = bästa förslaget
+    category_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)  # 0-1
 
 
 class Period(Base):
@@ -61,18 +83,72 @@ class Period(Base):
     __tablename__ = "periods"
 
     id = Column(Integer, primary_key=True, index=True)
-    start_date = Column(DateTime, nullable=False, index=True)
+    start_date = Column(DateTime, nullable=False, unique=True, index=True)
     end_date = Column(DateTime, nullable=False)
 
-    # Sammanfattning (cache för snabbare visning)
-    total_income = Column(Float, default=0.0)
-    total_expenses = Column(Float, default=0.0)
-    total_fixed = Column(Float, default=0.0)
-    total_variable = Column(Float, default=0.0)
+    # Sammanfattning (cache för snabbare visning, se services/period_rollup.py)
+    total_income = Column(Money, default=0.0)
+    total_expenses = Column(Money, default=0.0)
+    total_fixed = Column(Money, default=0.0)
+    total_variable = Column(Money, default=0.0)
+    transaction_count = Column(Integer, default=0)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    categories = relationship("PeriodCategory", back_populates="period", cascade="all, delete-orphan")
+
+
+class PeriodCategory(Base):
+    """Summering per kategori inom en löneperiod"""
+    __tablename__ = "period_categories"
+    __table_args__ = (UniqueConstraint("period_id", "category_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    period_id = Column(Integer, ForeignKey("periods.id"), nullable=False)
+    category_id = Column(Integer, nullable=False)  # 0 = okategoriserad, ingen FK (borttagna kategorier behålls)
+
+    total_income = Column(Money, default=0.0)  # Summa av positiva belopp
+    total_expenses = Column(Money, default=0.0)  # Summa av negativa belopp, som positivt tal
+    transaction_count = Column(Integer, default=0)
+    income_count = Column(Integer, default=0)
+    expense_count = Column(Integer, default=0)
+
+    period = relationship("Period", back_populates="categories")
+
+
+class Job(Base):
+    """Bakgrundsjobb (import, auto-kategorisering), se services/jobs.py"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # 'import' eller 'auto_categorize'
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, done, failed
+    params = Column(JSON, nullable=False, default=dict)
+    file_path = Column(String, nullable=True)  # Sparad uppladdning för import
+
+    # Förlopp. state sparas i samma transaktion som varje batch så att
+    # ett avbrutet jobb kan fortsätta där det slutade.
+    total_rows = Column(Integer, nullable=True)
+    processed_rows = Column(Integer, default=0)
+    state = Column(JSON, nullable=False, default=dict)
+
+    result = Column(JSON, nullable=True)  # ImportResponse m.m. när jobbet är klart
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def rows_per_second(self):
+        """Genomströmning sedan start"""
+        if not self.started_at or not self.processed_rows:
+            return None
+        seconds = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        return round(self.processed_rows / seconds, 1) if seconds > 0 else None
+
 
 class Loan(Base):
     """Lån som ska spåras"""
@@ -80,10 +156,10 @@ class Loan(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)  # "Huslån", "Billån", "Lån från pappa"
-    initial_amount = Column(Float, nullable=False)  # Ursprungligt lånebelopp
-    current_balance = Column(Float, nullable=False)  # Aktuellt saldo
+    initial_amount = Column(Money, nullable=False)  # Ursprungligt lånebelopp
+    current_balance = Column(Money, nullable=False)  # Aktuellt saldo
     interest_rate = Column(Float, nullable=True)  # Ränta i procent (t.ex. 2.5)
-    monthly_payment = Column(Float, nullable=True)  # Fast månadsbelopp
+    monthly_payment = Column(Money, nullable=True)  # Fast månadsbelopp
     start_date = Column(DateTime, nullable=False)
     description = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)  # För att kunna markera avslutade lån
@@ -100,9 +176,9 @@ class LoanPayment(Base):
     id = Column(Integer, primary_key=True, index=True)
     loan_id = Column(Integer, ForeignKey("loans.id"), nullable=False)
     date = Column(DateTime, nullable=False, index=True)
-    amount = Column(Float, nullable=False)
-    principal_amount = Column(Float, nullable=True)  # Amortering
-    interest_amount = Column(Float, nullable=True)  # Ränta
+    amount = Column(Money, nullable=False)
+    principal_amount = Column(Money, nullable=True)  # Amortering
+    interest_amount = Column(Money, nullable=True)  # Ränta
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -115,7 +191,7 @@ class Savings(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)  # "Gemensamt sparkonto"
-    current_balance = Column(Float, nullable=False)
+    current_balance = Column(Money, nullable=False)
     account_type = Column(String, nullable=True)  # "Sparkonto", "Fond", etc.
     description = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
@@ -132,7 +208,7 @@ class SavingsTransaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     savings_id = Column(Integer, ForeignKey("savings.id"), nullable=False)
     date = Column(DateTime, nullable=False, index=True)
-    amount = Column(Float, nullable=False)  # Positivt = insättning, Negativt = uttag
+    amount = Column(Money, nullable=False)  # Positivt = insättning, Negativt = uttag
     transaction_type = Column(String, nullable=False)  # "deposit", "withdrawal", "interest"
     description = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
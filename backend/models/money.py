@@ -0,0 +1,45 @@
+from typing import Optional
+from sqlalchemy import Float, Integer, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+from db_config import get_money_storage
+
+
+# Vald lagring (se db_config.py), gäller hela processen
+MONEY_STORAGE = get_money_storage()
+STORED_IN_ORE = MONEY_STORAGE == "ore"
+
+
+def to_ore(amount: float) -> int:
+    """Belopp i kronor som heltal ören (-456.5 -> -45650)"""
+    return int(round(amount * 100))
+
+
+class Money(TypeDecorator):
+    """
+    Belopp i kronor, float i Python oavsett lagring
+    Med BUDGET_MONEY_STORAGE=ore lagras beloppet som heltal ören: värden
+    avrundas till hela ören vid skrivning och SUM/+/- i SQL blir exakta
+    heltalsoperationer. Aggregat över kolumnen (sum, case, -x) får samma typ
+    och räknas om till kronor när de läses.
+    """
+    impl = Float
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(Integer() if STORED_IN_ORE else Float())
+
+    def process_bind_param(self, value: Optional[float], dialect):
+        if value is None or not STORED_IN_ORE:
+            return value
+        return to_ore(value)
+
+    def process_result_value(self, value, dialect) -> Optional[float]:
+        if value is None or not STORED_IN_ORE:
+            return value
+        return value / 100
+
+
+def stored_expression(column):
+    """Kolumnens lagrade värde utan omräkning (ören eller kronor beroende på lagring)"""
+    return type_coerce(column, Integer if STORED_IN_ORE else Float)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict, Any, List
 
 
 class CategoryBase(BaseModel):
@@ -66,6 +66,14 @@ class TransactionUpdate(BaseModel):
     description: Optional[str] = None
 
 
+class CategorySuggestion(BaseModel):
+    category_id: int
+    score: float  # 0-1
+
+    class Config:
+        from_attributes = True
+
+
 class Transaction(TransactionBase):
     id: int
     import_hash: str
@@ -73,6 +81,7 @@ class Transaction(TransactionBase):
     created_at: datetime
     updated_at: datetime
     category: Optional[Category] = None
+    suggestions: List[CategorySuggestion] = []  # Bara för okategoriserade
 
     class Config:
         from_attributes = True
@@ -101,6 +110,58 @@ class ImportResponse(BaseModel):
     duplicates: int
     errors: int
     message: str
+    timings: Optional[Dict[str, float]] = None  # Millisekunder per fas
+
+
+class RulePreviewCategory(BaseModel):
+    category_id: Optional[int] = None  # None = okategoriserad
+    category_name: Optional[str] = None
+    count: int
+
+
+class RulePreview(BaseModel):
+    matched: int  # Alla transaktioner som matchar mönstret
+    unchanged: int  # Har redan regelns kategori
+    manual: int  # Manuellt kategoriserade, rörs inte
+    to_update: int
+    uncategorized: int  # Varav okategoriserade
+    by_category: List[RulePreviewCategory]  # to_update per nuvarande kategori
+    samples: List[Transaction]
+
+
+class RuleApplyResponse(BaseModel):
+    updated: int
+    message: str
+
+
+class FileImportResult(BaseModel):
+    filename: str
+    imported: int
+    duplicates: int
+    errors: int
+    error: Optional[str] = None
+
+
+class BatchImportResponse(ImportResponse):
+    files: List[FileImportResult]
+    workers: int  # Antal processer som parsade filerna
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str  # queued, running, done, failed
+    total_rows: Optional[int] = None
+    processed_rows: int = 0
+    rows_per_second: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
 
 
 class BulkCategorizeRequest(BaseModel):
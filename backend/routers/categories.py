@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -9,13 +9,21 @@ from models.schemas import (
     CategoryCreate,
     CategoryUpdate,
     CategoryRule as CategoryRuleSchema,
-    CategoryRuleCreate
+    CategoryRuleCreate,
+    RulePreview,
+    RuleApplyResponse
 )
+from services.rule_cache import bump_rules_version, get_rule_cache_stats
+from services.classifier import forget_category, get_category_model, train_category_model, MODEL_THRESHOLD
+from services.suggestions import refresh_suggestions
+from services.rule_preview import preview_rule, apply_rule, PREVIEW_SAMPLE_SIZE
+from services.period_rollup import PeriodRollup, recompute_period_totals
+from services.http_cache import conditional_get
 
 router = APIRouter(prefix="/api/categories", tags=["categories"])
 
 
-@router.get("/", response_model=List[CategorySchema])
+@router.get("/", response_model=List[CategorySchema], dependencies=[Depends(conditional_get("categories"))])
 def get_categories(db: Session = Depends(get_db)):
     """
     Hämta alla kategorier
@@ -55,9 +63,15 @@ def update_category(
         raise HTTPException(status_code=404, detail="Kategori hittades inte")
 
     update_data = category_update.model_dump(exclude_unset=True)
+    type_changed = 'type' in update_data and update_data['type'] != category.type
     for field, value in update_data.items():
         setattr(category, field, value)
 
+    # Fast/rörlig-fördelningen i periodsummeringen beror på kategorins typ
+    if type_changed:
+        db.flush()
+        recompute_period_totals(db)
+
     db.commit()
     db.refresh(category)
     return category
@@ -72,14 +86,55 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
     if not category:
         raise HTTPException(status_code=404, detail="Kategori hittades inte")
 
+    # Kategorins transaktioner blir okategoriserade när den tas bort
+    rollup = PeriodRollup(db)
+    rollup.reassign_category(category.id, None)
+    rollup.flush()
+
     db.delete(category)
+    db.flush()
+    recompute_period_totals(db)
     db.commit()
+    bump_rules_version()  # Kategorins regler tas bort via cascade
+    forget_category(category_id)
     return {"message": "Kategori borttagen"}
 
 
+# --- Kategoriseringsmodell ---
+
+@router.get("/model")
+def get_model_status():
+    """
+    Status för den tränade kategoriseringsmodellen
+    """
+    model = get_category_model()
+    return {
+        "ready": model.is_ready,
+        "trained_rows": model.trained_rows,
+        "categories": len(model.category_ids),
+        "threshold": MODEL_THRESHOLD
+    }
+
+
+@router.post("/model/train")
+def train_model(db: Session = Depends(get_db)):
+    """
+    Träna om modellen från alla manuellt kategoriserade transaktioner
+    och räkna om kategoriförslagen
+    """
+    model = train_category_model(db)
+    refresh_suggestions(db)  # Förslagen bygger på modellen
+    return {
+        "message": f"Tränade modellen på {model.trained_rows} transaktioner",
+        "ready": model.is_ready,
+        "trained_rows": model.trained_rows,
+        "categories": len(model.category_ids)
+    }
+
+
 # --- Category Rules ---
 
-@router.get("/{category_id}/rules", response_model=List[CategoryRuleSchema])
+@router.get("/{category_id}/rules", response_model=List[CategoryRuleSchema], dependencies=[Depends(conditional_get("categories"))])
 def get_category_rules(category_id: int, db: Session = Depends(get_db)):
     """
     Hämta regler för en kategori
@@ -92,7 +147,11 @@ def get_category_rules(category_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/rules", response_model=CategoryRuleSchema)
-def create_category_rule(rule: CategoryRuleCreate, db: Session = Depends(get_db)):
+def create_category_rule(
+    rule: CategoryRuleCreate,
+    apply: bool = Query(False, description="Kategorisera även befintliga matchande transaktioner"),
+    db: Session = Depends(get_db)
+):
     """
     Skapa ny kategoriseringsregel
     """
@@ -103,11 +162,61 @@ def create_category_rule(rule: CategoryRuleCreate, db: Session = Depends(get_db)
 
     db_rule = CategoryRule(**rule.model_dump())
     db.add(db_rule)
+
+    if apply:
+        try:
+            apply_rule(db, rule.category_id, rule.pattern, rule.pattern_type)
+        except ValueError as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
     db.commit()
     db.refresh(db_rule)
+    bump_rules_version()
     return db_rule
 
 
+@router.post("/rules/preview", response_model=RulePreview)
+def preview_category_rule(
+    rule: CategoryRuleCreate,
+    sample_size: int = Query(PREVIEW_SAMPLE_SIZE, ge=0, le=200),
+    db: Session = Depends(get_db)
+):
+    """
+    Förhandsvisa vilka befintliga transaktioner en regel skulle påverka
+    """
+    try:
+        return preview_rule(db, rule.category_id, rule.pattern, rule.pattern_type, sample_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/rules/{rule_id}/apply", response_model=RuleApplyResponse)
+def apply_category_rule(rule_id: int, db: Session = Depends(get_db)):
+    """
+    Kör en regel retroaktivt på alla ej manuellt kategoriserade transaktioner
+    """
+    rule = db.query(CategoryRule).filter(CategoryRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Regel hittades inte")
+
+    try:
+        updated = apply_rule(db, rule.category_id, rule.pattern, rule.pattern_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    db.commit()
+    return {"updated": updated, "message": f"Kategoriserade om {updated} transaktioner"}
+
+
+@router.get("/rules/cache")
+def get_rule_cache():
+    """
+    Statistik för regelcachen (version, memo-träffar och missar)
+    """
+    return get_rule_cache_stats()
+
+
 @router.delete("/rules/{rule_id}")
 def delete_category_rule(rule_id: int, db: Session = Depends(get_db)):
     """
@@ -119,4 +228,5 @@ def delete_category_rule(rule_id: int, db: Session = Depends(get_db)):
 
     db.delete(rule)
     db.commit()
+    bump_rules_version()
     return {"message": "Regel borttagen"}
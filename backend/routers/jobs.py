@@ -0,0 +1,82 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from database import get_async_db, AsyncSessionLocal
+from models.database import Job
+from models.schemas import Job as JobSchema
+from services.jobs import FINISHED_STATUSES
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# Hur ofta SSE-strömmen läser jobbets förlopp (sekunder)
+EVENT_POLL_INTERVAL = 0.5
+
+# Kommentarrad som håller anslutningen vid liv genom proxyn när inget händer
+KEEPALIVE_INTERVAL = 15
+
+
+@router.get("/", response_model=List[JobSchema])
+async def get_jobs(limit: int = 20, db: AsyncSession = Depends(get_async_db)):
+    """
+    Hämta de senaste jobben
+    """
+    result = await db.execute(select(Job).order_by(Job.id.desc()).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Hämta ett jobb med förlopp och resultat
+    """
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Jobb hittades inte")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def get_job_events(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Följ ett jobb med Server-Sent Events
+
+    Skickar `progress` när förloppet ändras och avslutar med `done`
+    eller `failed` (data är jobbet som JSON).
+    """
+    if not await db.get(Job, job_id):
+        raise HTTPException(status_code=404, detail="Jobb hittades inte")
+
+    async def events():
+        last_payload = None
+        idle = 0.0
+
+        while not await request.is_disconnected():
+            async with AsyncSessionLocal() as session:
+                job = await session.get(Job, job_id)
+                payload = JobSchema.model_validate(job).model_dump_json()
+
+            if job.status in FINISHED_STATUSES:
+                yield f"event: {job.status}\ndata: {payload}\n\n"
+                return
+
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+                idle = 0.0
+            elif idle >= KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                idle = 0.0
+
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            idle += EVENT_POLL_INTERVAL
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx ska skicka händelserna direkt
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
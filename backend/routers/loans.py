@@ -12,11 +12,12 @@ from models.schemas import (
     LoanPayment as LoanPaymentSchema,
     LoanPaymentCreate
 )
+from services.http_cache import conditional_get
 
 router = APIRouter(prefix="/api/loans", tags=["loans"])
 
 
-@router.get("/", response_model=List[LoanSchema])
+@router.get("/", response_model=List[LoanSchema], dependencies=[Depends(conditional_get("loans"))])
 def get_loans(active_only: bool = True, db: Session = Depends(get_db)):
     """
     Hämta alla lån
@@ -28,7 +29,7 @@ def get_loans(active_only: bool = True, db: Session = Depends(get_db)):
     return loans
 
 
-@router.get("/{loan_id}", response_model=LoanWithPayments)
+@router.get("/{loan_id}", response_model=LoanWithPayments, dependencies=[Depends(conditional_get("loans"))])
 def get_loan(loan_id: int, db: Session = Depends(get_db)):
     """
     Hämta ett specifikt lån med betalningar
@@ -89,7 +90,7 @@ def delete_loan(loan_id: int, db: Session = Depends(get_db)):
 
 # --- Loan Payments ---
 
-@router.get("/{loan_id}/payments", response_model=List[LoanPaymentSchema])
+@router.get("/{loan_id}/payments", response_model=List[LoanPaymentSchema], dependencies=[Depends(conditional_get("loans"))])
 def get_loan_payments(loan_id: int, db: Session = Depends(get_db)):
     """
     Hämta betalningar för ett lån
@@ -1,62 +1,169 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, case
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
+from collections import defaultdict
+from types import SimpleNamespace
 
-from database import get_db
+from database import get_db, get_async_db
 from models.database import Transaction, Category
+from models.money import to_ore
 from models.schemas import Period as PeriodSchema
 from services.period_calculator import PeriodCalculator
+from services.period_rollup import rollup_rows_query, rebuild_rollup, check_rollup
+from services.data_version import get_versions
+from services.http_cache import ResponseCache, conditional_get
+from services.transaction_columns import get_transaction_columns
 
 router = APIRouter(prefix="/api/periods", tags=["periods"])
 
+# Summeringarna beror på transaktionerna (och rollupen) samt kategorierna
+PERIOD_FAMILIES = ("transactions", "categories")
 
-@router.get("/current")
-def get_current_period_summary(db: Session = Depends(get_db)) -> Dict[str, Any]:
+# Beräknade summeringar per (perioder, dataversioner)
+_summary_cache = ResponseCache()
+
+
+@router.get("/current", dependencies=[Depends(conditional_get(*PERIOD_FAMILIES, vary_by_day=True))])
+async def get_current_period_summary(db: AsyncSession = Depends(get_async_db)) -> Dict[str, Any]:
     """
     Hämta summering för aktuell löneperiod
     """
     calc = PeriodCalculator()
     start_date, end_date = calc.get_current_period()
 
-    return _get_period_summary(db, start_date, end_date)
+    summaries = await _cached_rollup_summaries(db, calc, [(start_date, end_date)])
+    return summaries[0]
 
 
-@router.get("/summary")
-def get_period_summary(
+@router.get("/summary", dependencies=[Depends(conditional_get(*PERIOD_FAMILIES))])
+async def get_period_summary(
     start_date: datetime = Query(..., description="Periodstart (ISO format)"),
     end_date: datetime = Query(..., description="Periodslut (ISO format)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """
     Hämta summering för specifik period
     """
-    return _get_period_summary(db, start_date, end_date)
+    # Hela löneperioder läses från den förberäknade summeringen
+    calc = PeriodCalculator()
+    if calc.get_period_for_date(start_date) == (start_date, end_date):
+        summaries = await _cached_rollup_summaries(db, calc, [(start_date, end_date)])
+        return summaries[0]
 
+    key = ("range", start_date, end_date, get_versions(PERIOD_FAMILIES))
+    summary = _summary_cache.get(key)
+    if summary is None:
+        summary = await db.run_sync(_get_period_summary, start_date, end_date)
+        _summary_cache.put(key, summary)
+    return summary
 
-@router.get("/list")
-def list_periods(
+
+@router.get("/list", dependencies=[Depends(conditional_get(*PERIOD_FAMILIES, vary_by_day=True))])
+async def list_periods(
     limit: int = 12,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     """
     Lista de senaste perioderna med summering
     """
     calc = PeriodCalculator()
-    current_start, current_end = calc.get_current_period()
+    return await _cached_rollup_summaries(db, calc, _recent_period_bounds(calc, limit))
 
-    periods = []
-    start_date, end_date = current_start, current_end
+
+@router.get("/trends", dependencies=[Depends(conditional_get(*PERIOD_FAMILIES, vary_by_day=True))])
+async def get_period_trends(
+    limit: int = 12,
+    account_name: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+) -> Dict[str, Any]:
+    """
+    Inkomster, utgifter och utgifter per kategori för de senaste perioderna
+    (äldst först), för diagram över tid
+    """
+    calc = PeriodCalculator()
+    bounds = _recent_period_bounds(calc, limit)[::-1]
+
+    key = ("trends", tuple(bounds), account_name, get_versions(PERIOD_FAMILIES))
+    trends = _summary_cache.get(key)
+    if trends is None:
+        trends = await db.run_sync(_get_period_trends, calc, bounds, account_name)
+        _summary_cache.put(key, trends)
+    return trends
+
+
+@router.post("/rebuild")
+def rebuild_periods(db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    Bygg om periodsummeringen från transaktionerna
+    """
+    period_count = rebuild_rollup(db)
+    db.commit()
+
+    return {"message": f"Byggde om {period_count} perioder", "period_count": period_count}
+
+
+@router.get("/consistency")
+def check_periods(db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    Jämför periodsummeringen mot transaktionerna
+    """
+    mismatches = check_rollup(db)
+
+    return {"consistent": not mismatches, "mismatches": mismatches}
+
+
+def _recent_period_bounds(calc: PeriodCalculator, limit: int) -> List[Tuple[datetime, datetime]]:
+    """De senaste limit perioderna, nyast först"""
+    bounds = []
+    start_date, end_date = calc.get_current_period()
 
     for _ in range(limit):
-        summary = _get_period_summary(db, start_date, end_date)
-        periods.append(summary)
+        bounds.append((start_date, end_date))
 
         # Gå till föregående period
         start_date, end_date = calc.get_previous_period(start_date)
 
-    return periods
+    return bounds
+
+
+async def _cached_rollup_summaries(
+    db: AsyncSession,
+    calc: PeriodCalculator,
+    bounds: List[Tuple[datetime, datetime]]
+) -> List[Dict[str, Any]]:
+    """
+    Summeringar från cachen, annars från rollupen
+    Versionerna läses före beräkningen: skrivs det under tiden sparas svaret
+    under de gamla versionerna och räknas om vid nästa anrop.
+    """
+    key = ("rollup", tuple(bounds), get_versions(PERIOD_FAMILIES))
+    summaries = _summary_cache.get(key)
+    if summaries is None:
+        summaries = await db.run_sync(_get_rollup_summaries, calc, bounds)
+        _summary_cache.put(key, summaries)
+    return summaries
+
+
+def _get_rollup_summaries(
+    db: Session,
+    calc: PeriodCalculator,
+    bounds: List[Tuple[datetime, datetime]]
+) -> List[Dict[str, Any]]:
+    """Bygg summeringar för hela löneperioder från periods/period_categories"""
+    if not bounds:
+        return []
+
+    rows_by_period = defaultdict(list)
+    for row in rollup_rows_query(db, [start_date for start_date, _ in bounds]):
+        rows_by_period[row.start_date].append(row)
+
+    return [
+        _build_summary(calc, start_date, end_date, rows_by_period[start_date])
+        for start_date, end_date in bounds
+    ]
 
 
 def _get_period_summary(
@@ -66,63 +173,154 @@ def _get_period_summary(
 ) -> Dict[str, Any]:
     """
     Beräkna summering för en period
+    Summorna räknas i transaktionernas kolumnbild (services/transaction_columns.py),
+    eller i databasen grupperat per kategori om tabellen inte ryms i minnet
     """
     calc = PeriodCalculator()
+    rows = _category_totals(db, _load_categories(db), start_date, end_date)
+
+    return _build_summary(calc, start_date, end_date, rows)
+
+
+def _get_period_trends(
+    db: Session,
+    calc: PeriodCalculator,
+    bounds: List[Tuple[datetime, datetime]],
+    account_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """Periodtotaler och utgifter per kategori och period (en lista per kategori i periodordning)"""
+    categories = _load_categories(db)
+
+    periods = []
+    trends: Dict[int, Dict[str, Any]] = {}
+    for i, (start_date, end_date) in enumerate(bounds):
+        summary = _build_summary(
+            calc, start_date, end_date, _category_totals(db, categories, start_date, end_date, account_name)
+        )
+        for category in summary.pop('categories'):
+            trend = trends.setdefault(category['category_id'], {
+                'category_id': category['category_id'],
+                'category_name': category['category_name'],
+                'color': category['color'],
+                'totals': [0.0] * len(bounds),
+            })
+            trend['totals'][i] = category['total']
+        periods.append(summary)
+
+    return {
+        'periods': periods,
+        'categories': sorted(trends.values(), key=lambda x: sum(x['totals']), reverse=True),
+    }
+
 
-    # Hämta alla transaktioner i perioden
-    transactions = (
-        db.query(Transaction)
-        .filter(
+def _load_categories(db: Session) -> Dict[int, Category]:
+    return {category.id: category for category in db.query(Category)}
+
+
+def _category_totals(
+    db: Session,
+    categories: Dict[int, Category],
+    start_date: datetime,
+    end_date: datetime,
+    account_name: Optional[str] = None
+) -> list:
+    """Aggregerade rader per kategori (se _category_totals_query) för intervallet"""
+    columns = get_transaction_columns(db)
+    if columns is None:
+        query = _category_totals_query(db).filter(
             Transaction.date >= start_date,
             Transaction.date <= end_date
         )
-        .all()
+        if account_name is not None:
+            query = query.filter(Transaction.account_name == account_name)
+        return query.group_by(Transaction.category_id).all()
+
+    rows = []
+    for category_id, transaction_count, expense_count, income, expenses in columns.category_totals(
+        start_date, end_date, account_name
+    ):
+        category = categories.get(category_id)
+        rows.append(SimpleNamespace(
+            category_id=category_id or None,
+            category_name=category.name if category else None,
+            category_type=category.type if category else None,
+            budget_limit=category.budget_limit if category else None,
+            color=category.color if category else None,
+            expense_kind='fixed' if category and category.type == 'fixed' else 'variable',
+            transaction_count=transaction_count,
+            expense_count=expense_count,
+            income=income,
+            expenses=expenses,
+        ))
+    return rows
+
+
+def _category_totals_query(db: Session):
+    """
+    Aggregat per kategori: antal, inkomster och utgifter (som positivt belopp)
+    Kategorins metadata hämtas i samma fråga via en outer join.
+    """
+    return (
+        db.query(
+            Transaction.category_id,
+            Category.name.label('category_name'),
+            Category.type.label('category_type'),
+            Category.budget_limit,
+            Category.color,
+            case((Category.type == 'fixed', 'fixed'), else_='variable').label('expense_kind'),
+            func.count(Transaction.id).label('transaction_count'),
+            func.count(case((Transaction.amount < 0, 1))).label('expense_count'),
+            func.sum(case((Transaction.amount > 0, Transaction.amount))).label('income'),
+            func.sum(case((Transaction.amount < 0, -Transaction.amount))).label('expenses'),
+        )
+        .outerjoin(Category, Category.id == Transaction.category_id)
     )
 
-    # Beräkna summor
-    total_income = sum(t.amount for t in transactions if t.amount > 0)
-    total_expenses = abs(sum(t.amount for t in transactions if t.amount < 0))
+
+def _build_summary(
+    calc: PeriodCalculator,
+    start_date: datetime,
+    end_date: datetime,
+    rows
+) -> Dict[str, Any]:
+    """Bygg periodens svar från aggregerade rader (en per kategori)"""
+    # Totalerna summeras i hela ören, som flyttal växer avrundningsfelet med antalet kategorier
+    total_income = 0
+    total_expenses = 0
+    total_fixed = 0
+    total_variable = 0
+    transaction_count = 0
 
     # Summera per kategori
-    category_summary = {}
-    total_fixed = 0.0
-    total_variable = 0.0
+    categories = []
 
-    for transaction in transactions:
-        if transaction.amount >= 0:  # Hoppa över inkomster
-            continue
+    for row in rows:
+        transaction_count += row.transaction_count
 
-        category_id = transaction.category_id or 0  # 0 = okategoriserad
-        amount = abs(transaction.amount)
+        if row.income is not None:
+            total_income += to_ore(row.income)
 
-        if category_id not in category_summary:
-            category = None
-            if category_id != 0:
-                category = db.query(Category).filter(Category.id == category_id).first()
+        if not row.expense_count:  # Bara inkomster i kategorin
+            continue
 
-            category_summary[category_id] = {
-                'category_id': category_id,
-                'category_name': category.name if category else 'Okategoriserad',
-                'category_type': category.type if category else 'variable',
-                'total': 0.0,
-                'budget_limit': category.budget_limit if category else None,
-                'color': category.color if category else '#94a3b8'
-            }
+        category_id = row.category_id or 0  # 0 = okategoriserad
+        amount = row.expenses
+        total_expenses += to_ore(amount)
 
-        category_summary[category_id]['total'] += amount
+        categories.append({
+            'category_id': category_id,
+            'category_name': row.category_name or 'Okategoriserad',
+            'category_type': row.category_type or 'variable',
+            'total': amount,
+            'budget_limit': row.budget_limit,
+            'color': row.color if row.category_name else '#94a3b8'
+        })
 
         # Summera fixed vs variable
-        if category_id != 0:
-            category = db.query(Category).filter(Category.id == category_id).first()
-            if category and category.type == 'fixed':
-                total_fixed += amount
-            else:
-                total_variable += amount
+        if row.expense_kind == 'fixed':
+            total_fixed += to_ore(amount)
         else:
-            total_variable += amount
-
-    # Konvertera till lista
-    categories = list(category_summary.values())
+            total_variable += to_ore(amount)
 
     # Sortera efter belopp
     categories.sort(key=lambda x: x['total'], reverse=True)
@@ -131,11 +329,11 @@ def _get_period_summary(
         'start_date': start_date.isoformat(),
         'end_date': end_date.isoformat(),
         'period_name': calc.format_period(start_date, end_date),
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'total_fixed': total_fixed,
-        'total_variable': total_variable,
-        'net': total_income - total_expenses,
+        'total_income': total_income / 100,
+        'total_expenses': total_expenses / 100,
+        'total_fixed': total_fixed / 100,
+        'total_variable': total_variable / 100,
+        'net': (total_income - total_expenses) / 100,
         'categories': categories,
-        'transaction_count': len(transactions)
+        'transaction_count': transaction_count
     }
@@ -12,11 +12,12 @@ from models.schemas import (
     SavingsTransaction as SavingsTransactionSchema,
     SavingsTransactionCreate
 )
+from services.http_cache import conditional_get
 
 router = APIRouter(prefix="/api/savings", tags=["savings"])
 
 
-@router.get("/", response_model=List[SavingsSchema])
+@router.get("/", response_model=List[SavingsSchema], dependencies=[Depends(conditional_get("savings"))])
 def get_savings(active_only: bool = True, db: Session = Depends(get_db)):
     """
     Hämta alla sparkonton
@@ -28,7 +29,7 @@ def get_savings(active_only: bool = True, db: Session = Depends(get_db)):
     return savings
 
 
-@router.get("/{savings_id}", response_model=SavingsWithTransactions)
+@router.get("/{savings_id}", response_model=SavingsWithTransactions, dependencies=[Depends(conditional_get("savings"))])
 def get_savings_account(savings_id: int, db: Session = Depends(get_db)):
     """
     Hämta ett specifikt sparkonto med transaktioner
@@ -89,7 +90,7 @@ def delete_savings(savings_id: int, db: Session = Depends(get_db)):
 
 # --- Savings Transactions ---
 
-@router.get("/{savings_id}/transactions", response_model=List[SavingsTransactionSchema])
+@router.get("/{savings_id}/transactions", response_model=List[SavingsTransactionSchema], dependencies=[Depends(conditional_get("savings"))])
 def get_savings_transactions(savings_id: int, db: Session = Depends(get_db)):
     """
     Hämta transaktioner för ett sparkonto
@@ -1,86 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
+import asyncio
+import io
+import time
 
-from database import get_db
+from database import get_db, get_async_db
 from models.database import Transaction, Category
-from models.schemas import Transaction as TransactionSchema, TransactionUpdate, ImportResponse, BulkCategorizeRequest
-from services.csv_parser import parse_seb_csv
+from models.schemas import Transaction as TransactionSchema, TransactionUpdate, ImportResponse, BatchImportResponse, BulkCategorizeRequest, Job as JobSchema
+from services.csv_parser import parse_seb_frame, iter_seb_frames
 from services.categorizer import TransactionCategorizer
+from services.classifier import manual_example, update_category_model
+from services.importer import import_transactions_async, import_transaction_stream_async, import_summary, elapsed_ms
+from services.auto_categorizer import auto_categorize_uncategorized, auto_categorize_summary
+from services.jobs import create_job, save_upload, count_data_rows
+from services.batch_import import import_files_async
 from services.period_calculator import PeriodCalculator
+from services.period_rollup import PeriodRollup
+from services.pagination import encode_cursor, decode_cursor
+from services.search import description_filter
+from services.suggestions import refresh_suggestions
+from services.transaction_list import transaction_list_query, fetch_transaction_list
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
 
-@router.post("/import", response_model=ImportResponse)
+@router.post("/import", response_model=Union[ImportResponse, JobSchema])
 async def import_csv(
+    response: Response,
     file: UploadFile = File(...),
     auto_categorize: bool = True,
-    db: Session = Depends(get_db)
+    streaming: bool = Query(False, description="Läs och importera filen i chunkar (begränsat minne)"),
+    chunk_size: int = Query(5000, ge=100, description="Antal rader per chunk vid streaming"),
+    background: bool = Query(False, description="Kör importen som bakgrundsjobb och returnera jobbet direkt"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Importera transaktioner från SEB CSV-fil
+
+    Med background=true sparas filen och ett jobb returneras (202).
+    Förloppet följs via /api/jobs/{id} och /api/jobs/{id}/events.
     """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Endast CSV-filer är tillåtna")
 
-    try:
-        # Läs fil
-        content = await file.read()
-        content_str = content.decode('utf-8')
+    if background:
+        file_path = await asyncio.to_thread(save_upload, file.file)
+        total_rows = await asyncio.to_thread(count_data_rows, file_path)
+        params = {'auto_categorize': auto_categorize, 'chunk_size': chunk_size, 'filename': file.filename}
 
-        # Parsa CSV
-        transactions_data = parse_seb_csv(content_str)
+        job = await db.run_sync(create_job, 'import', params, file_path, total_rows)
+        response.status_code = 202
+        return JobSchema.model_validate(job)
 
-        imported = 0
-        duplicates = 0
-        errors = 0
+    try:
+        timings = {}
 
         # Initiera kategoriserare om auto_categorize är på
-        categorizer = TransactionCategorizer(db) if auto_categorize else None
+        categorizer = await db.run_sync(TransactionCategorizer) if auto_categorize else None
 
-        for trans_data in transactions_data:
+        if streaming:
+            # Läs uppladdningen inkrementellt i stället för hela filen i minnet
+            await file.seek(0)
+            stream = io.TextIOWrapper(file.file, encoding='utf-8', newline='')
             try:
-                # Kolla om transaktionen redan finns (dubblettcheck)
-                existing = db.query(Transaction).filter(
-                    Transaction.import_hash == trans_data['import_hash']
-                ).first()
-
-                if existing:
-                    duplicates += 1
-                    continue
-
-                # Kategorisera automatiskt om möjligt
-                if categorizer and not trans_data.get('category_id'):
-                    category_id = categorizer.categorize(trans_data['description'])
-                    trans_data['category_id'] = category_id
-
-                # Skapa transaktion
-                transaction = Transaction(**trans_data)
-                db.add(transaction)
-                imported += 1
-
-            except Exception as e:
-                errors += 1
-                print(f"Error importing transaction: {e}")
-                continue
-
-        db.commit()
-
-        return ImportResponse(
-            imported=imported,
-            duplicates=duplicates,
-            errors=errors,
-            message=f"Importerade {imported} transaktioner, {duplicates} dubbletter hoppades över, {errors} fel"
-        )
+                result = await import_transaction_stream_async(db, iter_seb_frames(stream, chunk_size), categorizer)
+            finally:
+                stream.detach()
+        else:
+            # Läs fil
+            started = time.perf_counter()
+            content = await file.read()
+            content_str = content.decode('utf-8')
+
+            # Parsa CSV (i en tråd, pandas blockerar annars event-loopen)
+            frame = await asyncio.to_thread(parse_seb_frame, content_str)
+            timings['parse'] = elapsed_ms(started)
+
+            result = await import_transactions_async(db, frame, categorizer)
+
+        timings.update(result['timings'])
+
+        started = time.perf_counter()
+        await db.commit()
+        timings['commit'] = elapsed_ms(started)
+
+        return ImportResponse(**import_summary(result, timings))
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Fel vid import: {str(e)}")
+
+
+@router.post("/import-batch", response_model=BatchImportResponse)
+async def import_csv_batch(
+    files: List[UploadFile] = File(...),
+    auto_categorize: bool = True,
+    workers: Optional[int] = Query(None, ge=1, description="Max antal processer (standard: antal kärnor)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Importera flera SEB CSV-filer på en gång (t.ex. flera års kontoutdrag)
+
+    Filerna parsas parallellt på alla kärnor och skrivs i en transaktion.
+    Transaktioner som finns i flera filer importeras en gång.
+    """
+    invalid = [file.filename for file in files if not file.filename.endswith('.csv')]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Endast CSV-filer är tillåtna: {', '.join(invalid)}")
+
+    contents = [(file.filename, await file.read()) for file in files]
+
+    try:
+        result = await import_files_async(db, contents, auto_categorize, workers)
+
+        started = time.perf_counter()
+        await db.commit()
+        result['timings']['commit'] = elapsed_ms(started)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Fel vid import: {str(e)}")
 
+    summary = import_summary(result)
+    summary['message'] = f"{len(files)} filer: {summary['message']}"
+
+    return BatchImportResponse(**summary, files=result['files'], workers=result['workers'])
+
 
 @router.get("/", response_model=List[TransactionSchema])
-def get_transactions(
+async def get_transactions(
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[datetime] = None,
@@ -88,50 +139,74 @@ def get_transactions(
     category_id: Optional[int] = None,
     uncategorized: Optional[bool] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Fortsätt efter denna position (från X-Next-Cursor), skip ignoreras"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Hämta transaktioner med filtrering
+
+    Är sidan full returneras en cursor till nästa sida i headern
+    X-Next-Cursor. Med cursor kostar varje sida lika mycket oavsett
+    hur långt in i historiken den ligger, till skillnad från skip.
     """
-    query = db.query(Transaction).order_by(Transaction.date.desc())
+    query = transaction_list_query().order_by(Transaction.date.desc(), Transaction.id.desc())
 
     if start_date:
-        query = query.filter(Transaction.date >= start_date)
+        query = query.where(Transaction.date >= start_date)
     if end_date:
-        query = query.filter(Transaction.date <= end_date)
+        query = query.where(Transaction.date <= end_date)
     if category_id:
-        query = query.filter(Transaction.category_id == category_id)
+        query = query.where(Transaction.category_id == category_id)
     if uncategorized is not None:
         if uncategorized:
-            query = query.filter(Transaction.category_id.is_(None))
+            query = query.where(Transaction.category_id.is_(None))
         else:
-            query = query.filter(Transaction.category_id.isnot(None))
+            query = query.where(Transaction.category_id.isnot(None))
     if search:
-        query = query.filter(Transaction.description.ilike(f"%{search}%"))
+        query = query.where(description_filter(search))
+
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # date <= x gör att indexet på (date, id) kan användas som intervall
+        query = query.where(
+            Transaction.date <= cursor_date,
+            or_(Transaction.date < cursor_date, and_(Transaction.date == cursor_date, Transaction.id < cursor_id))
+        )
+    else:
+        query = query.offset(skip)
 
-    transactions = query.offset(skip).limit(limit).all()
-    return transactions
+    transactions = await db.run_sync(fetch_transaction_list, query.limit(limit))
+
+    headers = {}
+    if transactions and len(transactions) == limit:
+        last = transactions[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["date"], last["id"])
+
+    return ORJSONResponse(transactions, headers=headers)
 
 
 @router.get("/current-period", response_model=List[TransactionSchema])
-def get_current_period_transactions(db: Session = Depends(get_db)):
+async def get_current_period_transactions(db: AsyncSession = Depends(get_async_db)):
     """
     Hämta transaktioner för aktuell löneperiod (25:e till 24:e)
     """
     calc = PeriodCalculator()
     start_date, end_date = calc.get_current_period()
 
-    transactions = (
-        db.query(Transaction)
-        .filter(
+    query = (
+        transaction_list_query()
+        .where(
             Transaction.date >= start_date,
             Transaction.date <= end_date
         )
         .order_by(Transaction.date.desc())
-        .all()
     )
 
-    return transactions
+    return ORJSONResponse(await db.run_sync(fetch_transaction_list, query))
 
 
 @router.get("/{transaction_id}", response_model=TransactionSchema)
@@ -159,12 +234,19 @@ def update_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaktion hittades inte")
 
+    before = manual_example(transaction)
+
     # Uppdatera fält
     if transaction_update.category_id is not None:
         old_category = transaction.category_id
         transaction.category_id = transaction_update.category_id
         transaction.is_manually_categorized = True
 
+        # Flytta beloppet i periodsummeringen (innan inlärningen committar)
+        rollup = PeriodRollup(db)
+        rollup.move(transaction.date, transaction.amount, old_category, transaction.category_id)
+        rollup.flush()
+
         # Lär från manuell kategorisering
         if learn and transaction_update.category_id != old_category:
             categorizer = TransactionCategorizer(db)
@@ -178,6 +260,9 @@ def update_transaction(
 
     db.commit()
     db.refresh(transaction)
+
+    # Modellen lär sig av manuell kategorisering (se services/classifier.py)
+    update_category_model([(before, manual_example(transaction))])
     return transaction
 
 
@@ -190,8 +275,15 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaktion hittades inte")
 
+    rollup = PeriodRollup(db)
+    rollup.remove(transaction.date, transaction.amount, transaction.category_id)
+    rollup.flush()
+
+    example = manual_example(transaction)
     db.delete(transaction)
     db.commit()
+
+    update_category_model([(example, None)])
     return {"message": "Transaktion borttagen"}
 
 
@@ -210,23 +302,34 @@ def bulk_categorize_transactions(
         raise HTTPException(status_code=404, detail="Inga transaktioner hittades")
 
     categorizer = TransactionCategorizer(db) if learn else None
+    rollup = PeriodRollup(db)
+    learn_description = None
     updated_count = 0
 
+    changes = []
+
     for transaction in transactions:
+        before = manual_example(transaction)
         old_category = transaction.category_id
         transaction.category_id = request.category_id
         transaction.is_manually_categorized = True
+        rollup.move(transaction.date, transaction.amount, old_category, request.category_id)
 
         # Lär från första transaktionen i bulken
         if learn and categorizer and request.category_id and request.category_id != old_category and updated_count == 0:
-            categorizer.learn_from_manual_categorization(
-                transaction.description,
-                request.category_id
-            )
+            learn_description = transaction.description
 
+        changes.append((before, manual_example(transaction)))
         updated_count += 1
 
+    # Summeringen skrivs före inlärningen eftersom den committar
+    rollup.flush()
+
+    if learn_description is not None:
+        categorizer.learn_from_manual_categorization(learn_description, request.category_id)
+
     db.commit()
+    update_category_model(changes)
 
     return {
         "message": f"Kategoriserade {updated_count} transaktioner",
@@ -234,43 +337,38 @@ def bulk_categorize_transactions(
     }
 
 
+@router.post("/suggestions/refresh")
+def refresh_transaction_suggestions(db: Session = Depends(get_db)):
+    """
+    Räkna om kategoriförslagen för alla okategoriserade transaktioner
+    (t.ex. efter nya regler eller mer inlärning)
+    """
+    result = refresh_suggestions(db)
+    return {
+        "message": f"Beräknade {result['suggestions']} förslag för {result['transactions']} transaktioner",
+        **result
+    }
+
+
 @router.post("/auto-categorize")
-def auto_categorize_uncategorized(
+def auto_categorize_uncategorized_transactions(
+    response: Response,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    background: bool = Query(False, description="Kör som bakgrundsjobb och returnera jobbet direkt"),
     db: Session = Depends(get_db)
 ):
     """
     Kör automatisk kategorisering på okategoriserade transaktioner
     """
-    query = db.query(Transaction).filter(Transaction.category_id.is_(None))
-
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
-
-    uncategorized = query.all()
-
-    if not uncategorized:
-        return {
-            "message": "Inga okategoriserade transaktioner hittades",
-            "categorized_count": 0
+    if background:
+        params = {
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None
         }
+        job = create_job(db, 'auto_categorize', params)
+        response.status_code = 202
+        return JobSchema.model_validate(job)
 
-    categorizer = TransactionCategorizer(db)
-    categorized_count = 0
-
-    for transaction in uncategorized:
-        category_id = categorizer.categorize(transaction.description)
-        if category_id:
-            transaction.category_id = category_id
-            categorized_count += 1
-
-    db.commit()
-
-    return {
-        "message": f"Kategoriserade {categorized_count} av {len(uncategorized)} transaktioner",
-        "categorized_count": categorized_count,
-        "total_processed": len(uncategorized)
-    }
+    state = auto_categorize_uncategorized(db, start_date, end_date)
+    return auto_categorize_summary(state)
@@ -0,0 +1,146 @@
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models.database import Transaction
+from services.categorizer import TransactionCategorizer
+from services.importer import add_timing, elapsed_ms
+from services.period_rollup import PeriodRollup
+from services.transaction_columns import IDS_RECORDED_OPTION, record_transaction_changes
+
+
+# Transaktioner per batch (en commit per batch)
+AUTO_CATEGORIZE_BATCH_SIZE = 1000
+
+# Antal senaste batchar som redovisas var för sig i svaret (tiderna summeras för alla)
+REPORTED_BATCHES = 50
+
+# Det som sparas mellan batcharna för att kunna fortsätta
+RESUME_KEYS = ('categorized_count', 'total_processed', 'last_id')
+
+
+def uncategorized_query(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """Okategoriserade transaktioner, valfritt inom ett datumintervall"""
+    query = db.query(Transaction).filter(Transaction.category_id.is_(None))
+
+    if start_date:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date:
+        query = query.filter(Transaction.date <= end_date)
+
+    return query
+
+
+def auto_categorize_uncategorized(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    state: Optional[Dict[str, Any]] = None,
+    on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+    batch_size: int = AUTO_CATEGORIZE_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Kör reglerna på okategoriserade transaktioner, batch för batch i id-ordning
+    Bara (id, beskrivning) läses, varje unik beskrivning matchas en gång och
+    resultatet skrivs med en UPDATE per kategori på de rader som fortfarande
+    är okategoriserade (datum och belopp till summeringen kommer från RETURNING).
+    Varje batch committas. state (RESUME_KEYS) gör att en avbruten körning kan
+    fortsätta. on_batch anropas med state före varje commit så att anroparen
+    kan spara förloppet i samma transaktion. Svaret är state plus summerade
+    tider och de senaste REPORTED_BATCHES batcharna.
+    """
+    state = {key: (state or {}).get(key, 0) for key in RESUME_KEYS}
+    report = {'batch_count': 0, 'timings': {}, 'batches': deque(maxlen=REPORTED_BATCHES)}
+    categorizer = TransactionCategorizer(db)
+
+    while True:
+        started = time.perf_counter()
+        batch = (
+            uncategorized_query(db, start_date, end_date)
+            .with_entities(Transaction.id, Transaction.description)
+            .filter(Transaction.id > state['last_id'])
+            .order_by(Transaction.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        timings = {'select': elapsed_ms(started)}
+
+        # Kortutdrag upprepar samma butikstext, varje unik text matchas en gång
+        started = time.perf_counter()
+        descriptions = list(dict.fromkeys(description for _, description in batch))
+        matches = dict(zip(descriptions, categorizer.categorize_many(descriptions)))
+
+        ids_by_category: Dict[int, List[int]] = {}
+        for transaction_id, description in batch:
+            category_id = matches[description]
+            if category_id:
+                ids_by_category.setdefault(category_id, []).append(transaction_id)
+        timings['match'] = elapsed_ms(started)
+
+        # Bara rader som fortfarande är okategoriserade uppdateras: en manuell
+        # ändring mellan SELECT och UPDATE ska stå kvar. Summeringen och
+        # kolumnbilden får bara de rader som UPDATE faktiskt ändrade.
+        started = time.perf_counter()
+        table = Transaction.__table__
+        rollup = PeriodRollup(db)
+        categorized = 0
+        for category_id, ids in ids_by_category.items():
+            updated = db.execute(
+                update(table)
+                .where(table.c.id.in_(ids), table.c.category_id.is_(None))
+                .values(category_id=category_id)
+                .returning(table.c.id, table.c.date, table.c.amount),
+                execution_options={IDS_RECORDED_OPTION: True}
+            ).all()
+            record_transaction_changes(db, [transaction_id for transaction_id, _, _ in updated])
+            for _, date, amount in updated:
+                rollup.move(date, amount, None, category_id)
+            categorized += len(updated)
+        timings['update'] = elapsed_ms(started)
+
+        started = time.perf_counter()
+        rollup.flush()
+        timings['rollup'] = elapsed_ms(started)
+
+        state['categorized_count'] += categorized
+        state['total_processed'] += len(batch)
+        state['last_id'] = batch[-1].id
+        report['batch_count'] += 1
+        for phase, ms in timings.items():
+            add_timing(report, phase, ms)
+        report['batches'].append({
+            'rows': len(batch),
+            'unique_descriptions': len(descriptions),
+            'categorized': categorized,
+            'timings': timings
+        })
+
+        if on_batch:
+            on_batch(state)
+        db.commit()
+
+    report['timings'] = {phase: round(ms, 3) for phase, ms in report['timings'].items()}
+    return {**state, **report, 'batches': list(report['batches'])}
+
+
+def auto_categorize_summary(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Svar för auto-kategoriseringen"""
+    if not state['total_processed']:
+        return {
+            "message": "Inga okategoriserade transaktioner hittades",
+            "categorized_count": 0
+        }
+
+    return {
+        "message": f"Kategoriserade {state['categorized_count']} av {state['total_processed']} transaktioner",
+        "categorized_count": state['categorized_count'],
+        "total_processed": state['total_processed'],
+        "batch_count": state.get('batch_count', 0),
+        "timings": state.get('timings', {}),
+        "batches": state.get('batches', [])
+    }
@@ -0,0 +1,158 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.categorizer import fill_from_model
+from services.csv_parser import parse_seb_frame
+from services.importer import import_transactions_async, new_totals, add_result, add_timing, elapsed_ms
+from services.rule_cache import get_rules_version, load_rule_tuples
+from services.rule_matcher import RuleMatcher, RuleTuple
+
+
+# Övre gräns för antal processer vid batchimport
+MAX_IMPORT_WORKERS = os.cpu_count() or 1
+
+# Processerna startas från en forkserver: fork direkt från uvicorn-processen
+# kan ärva lås som andra trådar håller (loggning, SQLAlchemy-poolen, regelcachen)
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Poolen skapas vid första batchimporten och stängs vid avstängning
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Kompilerad matchning i varje arbetsprocess, byggs om när regelversionen ändras
+_worker_matcher: Optional[Tuple[int, RuleMatcher]] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == "forkserver":
+                # Arbetsprocesserna forkas med parsningen redan importerad
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=MAX_IMPORT_WORKERS, mp_context=context)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Släpp en trasig pool (t.ex. om en arbetsprocess dött), nästa import skapar en ny"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_import_pool():
+    """Stäng processpoolen (anropas vid avstängning)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _parse_file(content: bytes, rules_version: int, rules: Optional[List[RuleTuple]]) -> Tuple[pd.DataFrame, float]:
+    """
+    Körs i en arbetsprocess: parsa och förkategorisera en fil
+    Returnerar DataFrame med kolumnen category_id och tiden i ms.
+    """
+    global _worker_matcher
+    started = time.perf_counter()
+    frame = parse_seb_frame(content.decode('utf-8'))
+
+    if rules is not None:
+        if _worker_matcher is None or _worker_matcher[0] != rules_version:
+            _worker_matcher = (rules_version, RuleMatcher(rules))
+        category_ids = _worker_matcher[1].match_many(frame['description'].tolist())
+    else:
+        category_ids = [None] * len(frame)
+
+    frame['category_id'] = pd.Series(category_ids, index=frame.index, dtype=object)
+    return frame, elapsed_ms(started)
+
+
+async def import_files_async(
+    db: AsyncSession,
+    files: Sequence[Tuple[str, bytes]],
+    auto_categorize: bool = True,
+    max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Importera flera CSV-filer (filnamn, innehåll)
+
+    Filerna parsas och kategoriseras parallellt i processpoolen, högst
+    max_workers filer åt gången. En enda skrivare tar sedan emot dem i
+    filordning. Dubblettkontrollen mot
+    databasen ser rader från tidigare filer i samma transaktion, så samma
+    transaktion i två filer importeras bara en gång. Committar inte.
+    """
+    # Versionen läses före reglerna, se get_rule_matcher
+    rules_version = get_rules_version()
+    rules = await db.run_sync(load_rule_tuples) if auto_categorize else None
+    rules = [tuple(rule) for rule in rules] if rules is not None else None
+
+    workers = max(1, min(max_workers or MAX_IMPORT_WORKERS, MAX_IMPORT_WORKERS, len(files)))
+    totals = new_totals()
+    file_results = []
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    slots = asyncio.Semaphore(workers)
+    started = time.perf_counter()
+
+    async def parse(content: bytes):
+        async with slots:
+            return await loop.run_in_executor(pool, _parse_file, content, rules_version, rules)
+
+    futures = [asyncio.ensure_future(parse(content)) for _, content in files]
+    try:
+        for (filename, _), future in zip(files, futures):
+            try:
+                frame, parse_ms = await future
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                raise
+            except Exception as e:
+                totals['errors'] += 1
+                file_results.append({'filename': filename, 'imported': 0, 'duplicates': 0, 'errors': 1, 'error': str(e)})
+                continue
+
+            if auto_categorize:
+                # Modellen finns bara i huvudprocessen (några µs per rad)
+                category_ids = await asyncio.to_thread(
+                    fill_from_model, frame['description'].tolist(), frame['category_id'].tolist()
+                )
+                frame['category_id'] = pd.Series(category_ids, index=frame.index, dtype=object)
+
+            result = await import_transactions_async(db, frame)
+
+            add_timing(totals, 'parse_cpu', parse_ms)
+            add_result(totals, result)
+
+            file_results.append({
+                'filename': filename,
+                'imported': result['imported'],
+                'duplicates': result['duplicates'],
+                'errors': result['errors'],
+                'error': None
+            })
+    finally:
+        # Filer som inte hunnit parsas om importen avbröts
+        for future in futures:
+            future.cancel()
+
+    totals['timings'] = {phase: round(ms, 3) for phase, ms in totals['timings'].items()}
+    totals['timings']['wall'] = elapsed_ms(started)
+    totals['files'] = file_results
+    totals['workers'] = workers
+    return totals
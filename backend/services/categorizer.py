@@ -1,41 +1,49 @@
 import re
-from typing import Optional, List
+from functools import lru_cache
+from typing import Iterable, Optional, List
 from sqlalchemy.orm import Session
 from models.database import CategoryRule, Category
+from services.rule_cache import get_rule_matcher, bump_rules_version
+from services.classifier import predict_categories
+
+
+# Vanliga suffix som tas bort innan mönstret väljs
+_SUFFIX_RE = re.compile(r'\s+(AB|LTD|INC|CORP|STOCKHOLM|GÖTEBORG|MALMÖ).*$', re.IGNORECASE)
 
 
 class TransactionCategorizer:
-    """Automatisk kategorisering av transaktioner baserat på regler"""
+    """
+    Automatisk kategorisering av transaktioner baserat på regler
+    Det som ingen regel matchar går till den tränade modellen
+    (services/classifier.py) om den är tillräckligt säker.
+    """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, use_model: bool = True):
         self.db = db
+        self.use_model = use_model
         self._load_rules()
 
     def _load_rules(self):
-        """Ladda alla kategoriseringsregler sorterade efter prioritet"""
-        self.rules = (
-            self.db.query(CategoryRule)
-            .order_by(CategoryRule.priority.desc())
-            .all()
-        )
+        """Hämta kompilerade regler från den processgemensamma cachen"""
+        self.matcher = get_rule_matcher(self.db)
+        self.rules = self.matcher.rules
 
     def categorize(self, description: str) -> Optional[int]:
         """
         Kategorisera en transaktion baserat på beskrivning
         Returnerar category_id eller None
         """
-        description_lower = description.lower()
+        return self.categorize_many([description])[0]
 
-        for rule in self.rules:
-            if rule.pattern_type == "substring":
-                if rule.pattern.lower() in description_lower:
-                    return rule.category_id
+    def categorize_many(self, descriptions: Iterable[str]) -> List[Optional[int]]:
+        """Kategorisera flera beskrivningar i ett svep"""
+        descriptions = list(descriptions)
+        category_ids = self.matcher.match_many(descriptions)
 
-            elif rule.pattern_type == "regex":
-                if re.search(rule.pattern, description, re.IGNORECASE):
-                    return rule.category_id
+        if self.use_model:
+            category_ids = fill_from_model(descriptions, category_ids)
 
-        return None
+        return category_ids
 
     def learn_from_manual_categorization(
         self,
@@ -51,15 +59,18 @@ class TransactionCategorizer:
         # Ta bort vanliga prefixer och extrahera kärnord
         pattern = self._extract_pattern(description)
 
-        # Kolla om regeln redan finns
-        existing_rule = (
-            self.db.query(CategoryRule)
-            .filter(
-                CategoryRule.pattern == pattern,
-                CategoryRule.category_id == category_id
+        # Kolla om regeln redan finns (cachen räcker för att utesluta det)
+        if not self.matcher.has_rule(pattern, category_id):
+            existing_rule = None
+        else:
+            existing_rule = (
+                self.db.query(CategoryRule)
+                .filter(
+                    CategoryRule.pattern == pattern,
+                    CategoryRule.category_id == category_id
+                )
+                .first()
             )
-            .first()
-        )
 
         if existing_rule:
             return existing_rule
@@ -77,6 +88,7 @@ class TransactionCategorizer:
         self.db.refresh(new_rule)
 
         # Uppdatera regelcache
+        bump_rules_version()
         self._load_rules()
 
         return new_rule
@@ -89,12 +101,32 @@ class TransactionCategorizer:
         - "SBAB BANK AB" -> "SBAB"
         - "Spotify Premium" -> "Spotify"
         """
-        # Ta bort vanliga suffix
-        description = re.sub(r'\s+(AB|LTD|INC|CORP|STOCKHOLM|GÖTEBORG|MALMÖ).*$', '', description, flags=re.IGNORECASE)
+        return extract_pattern(description)
+
+
+def fill_from_model(descriptions: List[str], category_ids: List[Optional[int]]) -> List[Optional[int]]:
+    """Komplettera regelträffarna med modellens säkra förslag"""
+    missing = [i for i, category_id in enumerate(category_ids) if category_id is None]
+    if not missing:
+        return category_ids
+
+    predicted = predict_categories([descriptions[i] for i in missing])
+    category_ids = list(category_ids)
+    for i, category_id in zip(missing, predicted):
+        category_ids[i] = category_id
+
+    return category_ids
+
+
+@lru_cache(maxsize=4096)
+def extract_pattern(description: str) -> str:
+    """Se TransactionCategorizer._extract_pattern (ren funktion, memoiserad)"""
+    # Ta bort vanliga suffix
+    description = _SUFFIX_RE.sub('', description)
 
-        # Ta första ordet (vanligtvis företagsnamn)
-        words = description.strip().split()
-        if words:
-            return words[0].upper()
+    # Ta första ordet (vanligtvis företagsnamn)
+    words = description.strip().split()
+    if words:
+        return words[0].upper()
 
-        return description.strip().upper()
+    return description.strip().upper()
@@ -0,0 +1,362 @@
+import os
+import re
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models.database import Transaction
+
+
+# Sparad modell (återskapas från manuellt kategoriserade transaktioner om den saknas)
+MODEL_PATH = os.environ.get("BUDGET_MODEL_PATH", "./category_model.npz")
+
+# Förslag med minst denna säkerhet sätts direkt vid import, övriga blir bara förslag
+MODEL_THRESHOLD = float(os.environ.get("BUDGET_MODEL_THRESHOLD", "0.9"))
+
+# Manuella ändringar sparas samlat efter så här många sekunder (och vid avstängning).
+# Går sparningen förlorad tränas modellen om vid nästa start (se load_category_model).
+MODEL_SAVE_DELAY = float(os.environ.get("BUDGET_MODEL_SAVE_DELAY", "30"))
+
+# Hashade tecken-n-gram. 2^16 hinkar x float32 = 256 kB per kategori.
+HASH_BITS = 16
+NGRAM_SIZES = (3, 4)
+
+# Laplace-utjämning per hink
+ALPHA = 0.1
+
+# Naiv Bayes ger nästan alltid säkerhet ~1.0 eftersom n-grammen inte är
+# oberoende. Log-sannolikheten normeras per n-gram och skalas med denna
+# faktor, då får okända butiker låg säkerhet medan kända behåller hög.
+CONFIDENCE_SCALE = 5.0
+
+# Modellen används först när den sett tillräckligt många exempel
+MIN_TRAINING_ROWS = 10
+MIN_CLASSES = 2
+
+# Beskrivningar per predict-anrop (begränsar minnet för mellanresultaten)
+PREDICT_CHUNK_SIZE = 2000
+
+_DIGITS_RE = re.compile(r"\d")
+_HASH_PRIME = np.uint64(1099511628211)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_HASH_SHIFT = np.uint64(64 - HASH_BITS)
+
+# (beskrivning, category_id)
+Example = Tuple[str, int]
+
+
+def hash_features(descriptions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashade n-gram för flera beskrivningar i ett svep
+    Returnerar (hinkar, startindex per beskrivning). Hinkarna ligger i
+    beskrivningsordning så att np.add.reduceat kan summera per beskrivning.
+    """
+    # Gemener och siffror som 0 (butiksnummer, datum) med mellanslag runt
+    texts = [f" {_DIGITS_RE.sub('0', description.lower())} ".ljust(max(NGRAM_SIZES)) for description in descriptions]
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    text_starts = np.cumsum(lengths) - lengths
+
+    buckets = []
+    doc_ids = []
+    for n in NGRAM_SIZES:
+        # Polynomhash för varje position i den sammanslagna texten
+        hashes = np.full(len(codes) - n + 1, n, dtype=np.uint64)
+        for k in range(n):
+            hashes = hashes * _HASH_PRIME + codes[k:len(codes) - n + 1 + k]
+
+        # Bara n-gram som ligger helt inom en beskrivning
+        counts = lengths - n + 1
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(text_starts, counts) + offsets
+
+        buckets.append((hashes[positions] * _HASH_MIX) >> _HASH_SHIFT)
+        doc_ids.append(np.repeat(np.arange(len(texts)), counts))
+
+    doc_ids = np.concatenate(doc_ids)
+    order = np.argsort(doc_ids, kind="stable")
+    buckets = np.concatenate(buckets)[order].astype(np.intp)
+    starts = np.searchsorted(doc_ids[order], np.arange(len(texts)))
+
+    return buckets, starts
+
+
+class CategoryModel:
+    """
+    Naiv Bayes (multinomial) över hashade tecken-n-gram
+
+    Tränas från manuellt kategoriserade transaktioner och uppdateras
+    inkrementellt, att lära/glömma ett exempel är bara att lägga till/dra
+    ifrån räknare. Prediktionen är vektoriserad över en hel batch.
+    """
+
+    def __init__(self):
+        self.category_ids = np.zeros(0, dtype=np.int64)
+        self.feature_counts = np.zeros((0, 1 << HASH_BITS), dtype=np.float32)
+        self.class_counts = np.zeros(0, dtype=np.float64)
+        self._lock = threading.Lock()
+        self._tables = None  # (category_ids, log_prior, log_likelihood.T), byggs vid behov
+
+    @property
+    def trained_rows(self) -> int:
+        return int(self.class_counts.sum())
+
+    @property
+    def is_ready(self) -> bool:
+        return len(self.category_ids) >= MIN_CLASSES and self.trained_rows >= MIN_TRAINING_ROWS
+
+    def update(self, added: Iterable[Example] = (), removed: Iterable[Example] = ()):
+        """Lär nya exempel och glöm borttagna (t.ex. när en kategori ändras)"""
+        with self._lock:
+            for examples, weight in ((list(added), 1.0), (list(removed), -1.0)):
+                if not examples:
+                    continue
+
+                descriptions = [description for description, _ in examples]
+                rows = self._class_rows([category_id for _, category_id in examples])
+                buckets, starts = hash_features(descriptions)
+                counts = np.diff(np.append(starts, len(buckets)))
+
+                np.add.at(self.feature_counts, (np.repeat(rows, counts), buckets), weight)
+                np.add.at(self.class_counts, rows, weight)
+
+            # Avrundningsfel får inte ge negativa räknare
+            np.maximum(self.feature_counts, 0, out=self.feature_counts)
+            np.maximum(self.class_counts, 0, out=self.class_counts)
+            self._keep_classes(self.class_counts > 0)
+
+    def forget_category(self, category_id: int):
+        """Ta bort en kategori ur modellen (när kategorin tas bort)"""
+        with self._lock:
+            self._keep_classes(self.category_ids != category_id)
+
+    def predict(self, descriptions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returnerar (category_id, säkerhet 0-1) per beskrivning"""
+        category_ids, confidence = self.predict_top(descriptions, 1)
+        return category_ids[:, 0], confidence[:, 0]
+
+    def predict_top(self, descriptions: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """De k troligaste kategorierna per beskrivning, (category_ids, sannolikheter) med form (n, k)"""
+        category_ids = np.zeros((len(descriptions), k), dtype=np.int64)
+        confidence = np.zeros((len(descriptions), k), dtype=np.float64)
+        if not self.is_ready or not len(descriptions):
+            return category_ids, confidence
+
+        classes, log_prior, log_likelihood = self._get_tables()
+        top_k = min(k, len(classes))
+
+        for i in range(0, len(descriptions), PREDICT_CHUNK_SIZE):
+            buckets, starts = hash_features(descriptions[i:i + PREDICT_CHUNK_SIZE])
+            ngrams = np.diff(np.append(starts, len(buckets)))[:, None]
+            joint = np.add.reduceat(log_likelihood[buckets], starts, axis=0, dtype=np.float64)
+            joint = joint / ngrams * CONFIDENCE_SCALE + log_prior
+
+            # Softmax över kategorierna ger posteriorn
+            joint -= joint.max(axis=1, keepdims=True)
+            posterior = np.exp(joint)
+            posterior /= posterior.sum(axis=1, keepdims=True)
+
+            best = np.argsort(-posterior, axis=1, kind="stable")[:, :top_k]
+            rows = slice(i, i + len(starts))
+            category_ids[rows, :top_k] = classes[best]
+            confidence[rows, :top_k] = np.take_along_axis(posterior, best, axis=1)
+
+        return category_ids, confidence
+
+    def save(self, path: str = MODEL_PATH):
+        """
+        Spara atomärt (skriv till temporär fil och byt namn)
+        Låset hålls bara medan räknarna kopieras, inte under komprimeringen.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.tmp.npz"
+
+        with self._lock:
+            arrays = {
+                "category_ids": self.category_ids.copy(),
+                "feature_counts": self.feature_counts.copy(),
+                "class_counts": self.class_counts.copy(),
+            }
+        np.savez_compressed(
+            temporary,
+            hash_bits=HASH_BITS,
+            ngram_sizes=np.array(NGRAM_SIZES),
+            **arrays
+        )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> Optional["CategoryModel"]:
+        """Läs en sparad modell. None om filen saknas eller har andra features."""
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            if int(data["hash_bits"]) != HASH_BITS or tuple(data["ngram_sizes"]) != NGRAM_SIZES:
+                return None
+
+            model = cls()
+            model.category_ids = data["category_ids"].astype(np.int64)
+            model.feature_counts = data["feature_counts"].astype(np.float32)
+            model.class_counts = data["class_counts"].astype(np.float64)
+
+        return model
+
+    def _keep_classes(self, keep: np.ndarray):
+        if not keep.all():
+            self.category_ids = self.category_ids[keep]
+            self.feature_counts = self.feature_counts[keep]
+            self.class_counts = self.class_counts[keep]
+        self._tables = None
+
+    def _class_rows(self, category_ids: List[int]) -> np.ndarray:
+        """Rad per category_id, nya kategorier läggs till"""
+        known = {int(category_id): row for row, category_id in enumerate(self.category_ids)}
+        new = [category_id for category_id in dict.fromkeys(category_ids) if category_id not in known]
+
+        if new:
+            known.update((category_id, len(self.category_ids) + i) for i, category_id in enumerate(new))
+            self.category_ids = np.append(self.category_ids, np.array(new, dtype=np.int64))
+            self.feature_counts = np.vstack([
+                self.feature_counts,
+                np.zeros((len(new), self.feature_counts.shape[1]), dtype=np.float32)
+            ])
+            self.class_counts = np.append(self.class_counts, np.zeros(len(new)))
+
+        return np.array([known[category_id] for category_id in category_ids], dtype=np.intp)
+
+    def _get_tables(self):
+        tables = self._tables
+        if tables is not None:
+            return tables
+
+        with self._lock:
+            if self._tables is None:
+                counts = self.feature_counts.astype(np.float64) + ALPHA
+                log_likelihood = np.log(counts) - np.log(counts.sum(axis=1, keepdims=True))
+                log_prior = np.log(self.class_counts + 1) - np.log(self.class_counts.sum() + len(self.class_counts))
+                # Transponerad så att uppslag per hink ger en rad med alla kategorier
+                self._tables = (
+                    self.category_ids,
+                    log_prior,
+                    np.ascontiguousarray(log_likelihood.T, dtype=np.float32)
+                )
+            return self._tables
+
+
+_model = CategoryModel()
+
+_save_lock = threading.Lock()
+_write_lock = threading.Lock()
+_save_timer: Optional[threading.Timer] = None
+
+
+def get_category_model() -> CategoryModel:
+    return _model
+
+
+def manual_examples(db: Session) -> List[Example]:
+    """Manuellt kategoriserade transaktioner som träningsdata"""
+    return (
+        db.query(Transaction.description, Transaction.category_id)
+        .filter(Transaction.is_manually_categorized.is_(True), Transaction.category_id.isnot(None))
+        .all()
+    )
+
+
+def train_category_model(db: Session, path: str = MODEL_PATH) -> CategoryModel:
+    """Träna om från grunden och spara"""
+    global _model
+    model = CategoryModel()
+    model.update([tuple(example) for example in manual_examples(db)])
+    with _write_lock:
+        model.save(path)
+    _model = model
+    return model
+
+
+def load_category_model(db: Session, path: str = MODEL_PATH) -> CategoryModel:
+    """
+    Läs sparad modell vid start. Tränas om om den saknas eller inte stämmer
+    med antalet manuellt kategoriserade transaktioner (t.ex. efter en krasch
+    innan modellen sparades).
+    """
+    global _model
+    model = CategoryModel.load(path)
+    expected = (
+        db.query(Transaction.id)
+        .filter(Transaction.is_manually_categorized.is_(True), Transaction.category_id.isnot(None))
+        .count()
+    )
+
+    if model is None or model.trained_rows != expected:
+        return train_category_model(db, path)
+
+    _model = model
+    return model
+
+
+def manual_example(transaction: Transaction) -> Optional[Example]:
+    """Transaktionen som träningsexempel, om den är manuellt kategoriserad"""
+    if transaction.is_manually_categorized and transaction.category_id is not None:
+        return (transaction.description, transaction.category_id)
+    return None
+
+
+def update_category_model(changes: Iterable[Tuple[Optional[Example], Optional[Example]]]):
+    """
+    Uppdatera modellen efter manuella ändringar (sparas senare, se schedule_model_save)
+    changes är par (före, efter) från manual_example, None = inget exempel.
+    """
+    added = []
+    removed = []
+    for before, after in changes:
+        if before == after:
+            continue
+        if before is not None:
+            removed.append(before)
+        if after is not None:
+            added.append(after)
+
+    if added or removed:
+        _model.update(added, removed)
+        schedule_model_save()
+
+
+def forget_category(category_id: int):
+    """Ta bort en borttagen kategori ur modellen"""
+    _model.forget_category(category_id)
+    schedule_model_save()
+
+
+def schedule_model_save():
+    """Spara modellen om MODEL_SAVE_DELAY sekunder, om det inte redan är planerat"""
+    global _save_timer
+    with _save_lock:
+        if _save_timer is None:
+            _save_timer = threading.Timer(MODEL_SAVE_DELAY, flush_category_model)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+
+def flush_category_model():
+    """Spara modellen nu om den ändrats sedan den senast sparades (anropas även vid avstängning)"""
+    global _save_timer
+    with _save_lock:
+        timer, _save_timer = _save_timer, None
+    if timer is None:
+        return
+
+    timer.cancel()
+    with _write_lock:
+        _model.save()
+
+
+def predict_categories(descriptions: Sequence[str], threshold: float = MODEL_THRESHOLD) -> List[Optional[int]]:
+    """category_id där modellen är minst threshold säker, annars None"""
+    category_ids, confidence = _model.predict(descriptions)
+    return [
+        int(category_id) if score >= threshold else None
+        for category_id, score in zip(category_ids.tolist(), confidence.tolist())
+    ]
@@ -1,9 +1,22 @@
 import pandas as pd
+import numpy as np
 import hashlib
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, TextIO
 from io import StringIO
 
+from models.money import to_ore
+
+
+# Kolumner i den normaliserade DataFrame som importen konsumerar
+TRANSACTION_COLUMNS = ['date', 'description', 'amount', 'balance', 'import_hash', 'account_name']
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Antal rader med datum eller belopp som inte gick att tolka, i frame.attrs
+# (följer med DataFrame:n, även till batchimportens arbetsprocesser)
+PARSE_ERRORS_ATTR = 'parse_errors'
+
 
 def parse_seb_csv(file_content: str) -> List[Dict[str, Any]]:
     """
@@ -18,6 +31,15 @@ def parse_seb_csv(file_content: str) -> List[Dict[str, Any]]:
     Bokföringsdatum;Valutadatum;Verifikationsnummer;Text/Beteckning;Belopp;Saldo
     2024-01-15;2024-01-15;123456;ICA SUPERMARKET;-456.50;12345.67
     """
+    return frame_to_records(parse_seb_frame(file_content))
+
+
+def parse_seb_frame(file_content: str) -> pd.DataFrame:
+    """
+    Parsar SEB CSV-fil till en DataFrame med kolumnerna i TRANSACTION_COLUMNS
+    Hela filen konverteras kolumnvis utan att iterera över rader. Rader som
+    inte gick att tolka räknas i parse_error_count(frame).
+    """
     try:
         # Försök detektera avgränsare
         delimiter = detect_delimiter(file_content)
@@ -31,58 +53,131 @@ def parse_seb_csv(file_content: str) -> List[Dict[str, Any]]:
             decimal=','      # SEB använder komma som decimaltecken
         )
 
-        # Normalisera kolumnnamn (ta bort whitespace, lowercase)
-        df.columns = df.columns.str.strip().str.lower()
+        return normalize_seb_frame(df)
 
-        # Detektera kolumnnamn (olika varianter från SEB)
-        date_col = find_column(df, ['bokföringsdatum', 'datum', 'date', 'bokforingsdatum'])
-        desc_col = find_column(df, ['text/beteckning', 'text', 'beskrivning', 'description', 'beteckning'])
-        amount_col = find_column(df, ['belopp', 'amount'])
-        balance_col = find_column(df, ['saldo', 'balance'])
+    except Exception as e:
+        raise ValueError(f"Fel vid parsning av CSV: {str(e)}")
 
-        if not all([date_col, desc_col, amount_col]):
-            raise ValueError("Kunde inte hitta nödvändiga kolumner i CSV-filen")
 
-        transactions = []
+def iter_seb_frames(stream: TextIO, chunksize: int = 5000) -> Iterator[pd.DataFrame]:
+    """
+    Parsar SEB CSV från en textström i chunkar om chunksize rader
+    Varje chunk normaliseras som i parse_seb_frame, så minnesåtgången
+    begränsas av chunkstorleken i stället för filstorleken.
+    Strömmen måste vara sökbar (avgränsaren detekteras från första raden).
+    """
+    try:
+        delimiter = detect_delimiter(stream.readline())
+        stream.seek(0)
 
-        for _, row in df.iterrows():
-            # Skippa tomma rader
-            if pd.isna(row[date_col]) or pd.isna(row[amount_col]):
-                continue
+        reader = pd.read_csv(
+            stream,
+            delimiter=delimiter,
+            thousands=' ',
+            decimal=',',
+            chunksize=chunksize
+        )
 
-            # Parsa datum
-            try:
-                date = pd.to_datetime(row[date_col])
-            except:
-                continue  # Skippa rader med ogiltigt datum
+        for chunk in reader:
+            yield normalize_seb_frame(chunk)
 
-            # Hämta värden
-            description = str(row[desc_col]).strip()
-            amount = float(str(row[amount_col]).replace(' ', '').replace(',', '.'))
-            balance = None
+    except Exception as e:
+        raise ValueError(f"Fel vid parsning av CSV: {str(e)}")
 
-            if balance_col and not pd.isna(row[balance_col]):
-                try:
-                    balance = float(str(row[balance_col]).replace(' ', '').replace(',', '.'))
-                except:
-                    pass
 
-            # Skapa import hash för dubblettdetektering
-            import_hash = create_import_hash(date, amount, description)
+def normalize_seb_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Konvertera en inläst SEB-tabell till importens kolumner
+    Tomma rader hoppas över. Rader med datum eller belopp som inte går att
+    tolka hoppas också över men räknas (se parse_error_count).
+    """
+    # Normalisera kolumnnamn (ta bort whitespace, lowercase)
+    df.columns = df.columns.str.strip().str.lower()
 
-            transactions.append({
-                'date': date,
-                'description': description,
-                'amount': amount,
-                'balance': balance,
-                'import_hash': import_hash,
-                'account_name': 'SEB'
-            })
+    # Detektera kolumnnamn (olika varianter från SEB)
+    date_col = find_column(df, ['bokföringsdatum', 'datum', 'date', 'bokforingsdatum'])
+    desc_col = find_column(df, ['text/beteckning', 'text', 'beskrivning', 'description', 'beteckning'])
+    amount_col = find_column(df, ['belopp', 'amount'])
+    balance_col = find_column(df, ['saldo', 'balance'])
 
-        return transactions
+    if not all([date_col, desc_col, amount_col]):
+        raise ValueError("Kunde inte hitta nödvändiga kolumner i CSV-filen")
 
-    except Exception as e:
-        raise ValueError(f"Fel vid parsning av CSV: {str(e)}")
+    dates = parse_dates(df[date_col])
+    amounts = parse_amounts(df[amount_col])
+
+    # Skippa tomma rader och rader med ogiltigt datum/belopp
+    valid = dates.notna() & amounts.notna()
+    invalid = df.loc[~valid]
+    parse_errors = int((~(_is_blank(invalid[date_col]) & _is_blank(invalid[amount_col]))).sum())
+
+    result = pd.DataFrame({
+        'date': dates[valid],
+        'description': df.loc[valid, desc_col].astype(str).str.strip(),
+        'amount': amounts[valid],
+    })
+
+    if balance_col:
+        result['balance'] = parse_amounts(df.loc[valid, balance_col])
+    else:
+        result['balance'] = float('nan')
+
+    # Skapa import hash för dubblettdetektering
+    result['import_hash'] = create_import_hashes(result['date'], result['amount'], result['description'])
+    result['account_name'] = 'SEB'
+
+    result = result[TRANSACTION_COLUMNS].reset_index(drop=True)
+    result.attrs[PARSE_ERRORS_ATTR] = parse_errors
+    return result
+
+
+def parse_error_count(frame: pd.DataFrame) -> int:
+    """Antal rader som inte gick att tolka när frame parsades"""
+    return frame.attrs.get(PARSE_ERRORS_ATTR, 0)
+
+
+def _is_blank(column: pd.Series) -> pd.Series:
+    if column.dtype != object:
+        return column.isna()
+    return column.isna() | (column.astype(str).str.strip() == '')
+
+
+def parse_dates(column: pd.Series) -> pd.Series:
+    """Parsa datumkolumn med explicit format, med fallback för avvikande rader"""
+    if column.dtype == object:
+        dates = pd.to_datetime(column, format=DATE_FORMAT, errors='coerce')
+    else:
+        dates = pd.Series(pd.NaT, index=column.index, dtype='datetime64[ns]')
+
+    unparsed = dates.isna() & column.notna()
+    if unparsed.any():
+        dates[unparsed] = pd.to_datetime(column[unparsed], format='mixed', errors='coerce')
+
+    return dates
+
+
+def parse_amounts(column: pd.Series) -> pd.Series:
+    """Konvertera beloppskolumn till float, ogiltiga värden blir NaN"""
+    if column.dtype != object:
+        return pd.to_numeric(column, errors='coerce').astype('float64')
+
+    cleaned = (
+        column.astype(str)
+        .str.replace(' ', '', regex=False)
+        .str.replace('\xa0', '', regex=False)
+        .str.replace(',', '.', regex=False)
+    )
+    return pd.to_numeric(cleaned.where(column.notna()), errors='coerce').astype('float64')
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Konvertera normaliserad DataFrame till dicts med Python-typer (NaN -> None)"""
+    columns = [
+        frame[name].astype(object).where(frame[name].notna(), None).tolist()
+        for name in frame.columns
+    ]
+    names = list(frame.columns)
+    return [dict(zip(names, values)) for values in zip(*columns)]
 
 
 def detect_delimiter(content: str) -> str:
@@ -109,6 +204,48 @@ def find_column(df: pd.DataFrame, possible_names: List[str]) -> str:
 
 
 def create_import_hash(date: datetime, amount: float, description: str) -> str:
-    """Skapa unik hash för dubblettdetektering"""
+    """
+    Skapa unik hash för dubblettdetektering
+    Beloppet kodas som heltal ören, samma belopp ger samma hash oavsett hur
+    flyttalet skrivs (-456.5, -456.50) eller hur det lagras i databasen.
+    """
+    hash_string = f"{date.isoformat()}_{to_ore(amount)}_{description}"
+    return hashlib.md5(hash_string.encode()).hexdigest()
+
+
+def create_legacy_import_hash(date: datetime, amount: float, description: str) -> str:
+    """Hashen som användes före öreskodningen (str(float)), för dubbletter mot äldre rader"""
     hash_string = f"{date.isoformat()}_{amount}_{description}"
     return hashlib.md5(hash_string.encode()).hexdigest()
+
+
+def create_import_hashes(dates: pd.Series, amounts: pd.Series, descriptions: pd.Series) -> List[str]:
+    """
+    Skapa import hash för en hel kolumn åt gången
+    Ger exakt samma värden som create_import_hash per rad.
+    """
+    ore = (amounts * 100).round().astype('int64').astype(str)
+    return _md5_hashes(_iso_dates(dates) + '_' + ore + '_' + descriptions)
+
+
+def create_legacy_import_hashes(dates: pd.Series, amounts: pd.Series, descriptions: pd.Series) -> List[str]:
+    """Som create_legacy_import_hash per rad"""
+    amount_strings = pd.Series([repr(amount) for amount in amounts.tolist()], index=amounts.index)
+    return _md5_hashes(_iso_dates(dates) + '_' + amount_strings + '_' + descriptions)
+
+
+def _iso_dates(dates: pd.Series) -> pd.Series:
+    # Samma format som strftime('%Y-%m-%dT%H:%M:%S') men en bråkdel av tiden
+    iso_dates = pd.Series(np.datetime_as_string(dates.to_numpy(), unit='s'), index=dates.index, dtype=object)
+
+    # isoformat() tar med bråkdelar av sekunder bara när de finns
+    fractional = (dates.dt.microsecond != 0) | (dates.dt.nanosecond != 0)
+    if fractional.any():
+        iso_dates[fractional] = dates[fractional].map(lambda d: d.isoformat())
+
+    return iso_dates
+
+
+def _md5_hashes(hash_strings: pd.Series) -> List[str]:
+    md5 = hashlib.md5
+    return [md5(hash_string.encode()).hexdigest() for hash_string in hash_strings]
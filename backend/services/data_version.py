@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+# Tabeller grupperade i familjer. En läsning beror på en eller flera familjer
+# och är oförändrad så länge deras versioner är det. Periodsummeringen och
+# förslagen skrivs alltid tillsammans med transaktionerna.
+TABLE_FAMILIES = {
+    "transactions": "transactions",
+    "transaction_suggestions": "transactions",
+    "transactions_fts": "transactions",
+    "periods": "transactions",
+    "period_categories": "transactions",
+    "categories": "categories",
+    "category_rules": "categories",
+    "loans": "loans",
+    "loan_payments": "loans",
+    "savings": "savings",
+    "savings_transactions": "savings",
+    "jobs": "jobs",
+}
+
+# Versionerna finns bara i processen (backend kör en uvicorn-worker). Vid
+# omstart börjar de om, BOOT_ID i ETag:en gör att gamla ETags inte matchar.
+BOOT_ID = f"{os.getpid():x}{int(time.time()):x}"
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_modified: Dict[str, float] = {}
+_started = time.time()
+
+_PENDING_KEY = "data_version_families"
+
+
+def get_versions(families: Iterable[str]) -> Tuple[int, ...]:
+    """Aktuella versioner för familjerna, i angiven ordning"""
+    return tuple(_versions.get(family, 0) for family in families)
+
+
+def get_last_modified(families: Iterable[str]) -> float:
+    """Senaste ändringen (epoch-sekunder) bland familjerna, annars processens start"""
+    return max((_modified.get(family, _started) for family in families), default=_started)
+
+
+def bump_versions(families: Iterable[str]):
+    """Markera familjerna som ändrade (anropas efter commit)"""
+    now = time.time()
+    with _lock:
+        for family in families:
+            _versions[family] = _versions.get(family, 0) + 1
+            _modified[family] = now
+
+
+def get_version_stats() -> Dict[str, Dict[str, float]]:
+    return {
+        family: {"version": _versions.get(family, 0), "modified": _modified.get(family, _started)}
+        for family in sorted(set(TABLE_FAMILIES.values()))
+    }
+
+
+def _pending(session: Session) -> Set[str]:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+def _family(table_name: str) -> str:
+    return TABLE_FAMILIES.get(table_name, table_name)
+
+
+def install_version_hooks():
+    """
+    Räkna upp versionen för tabellerna som en session skriver till när den
+    committar. Lyssnarna sitter på Session-klassen och gäller därför även
+    AsyncSession (som kör en vanlig Session under huven) och bakgrundsjobben.
+    """
+    if event.contains(Session, "after_commit", _bump_committed):
+        return
+    event.listen(Session, "after_flush", _collect_flushed)
+    event.listen(Session, "do_orm_execute", _collect_executed)
+    event.listen(Session, "after_commit", _bump_committed)
+    event.listen(Session, "after_rollback", _discard_rolled_back)
+
+
+def _collect_flushed(session: Session, flush_context):
+    """ORM-ändringar (add, ändrade attribut, delete)"""
+    pending = _pending(session)
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(instance, "__table__", None)
+        if table is not None:
+            pending.add(_family(table.name))
+
+
+def _collect_executed(orm_execute_state):
+    """Bulk-skrivningar via session.execute (insert/update/delete mot tabellen)"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _pending(orm_execute_state.session).add(_family(table.name))
+
+
+def _bump_committed(session: Session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        bump_versions(pending)
+
+
+def _discard_rolled_back(session: Session):
+    session.info.pop(_PENDING_KEY, None)
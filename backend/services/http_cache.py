@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from email.utils import formatdate
+from typing import Any, Callable, Hashable, Optional
+from fastapi import HTTPException, Request, Response
+
+from services.data_version import BOOT_ID, get_last_modified, get_versions
+
+
+# Antal svar i varje ResponseCache (LRU)
+RESPONSE_CACHE_SIZE = 256
+
+
+def make_etag(families: tuple, vary_by_day: bool = False) -> str:
+    """ETag av datafamiljernas versioner (och dagens datum för svar som beror på det)"""
+    tag = BOOT_ID + "-" + ".".join(str(version) for version in get_versions(families))
+    if vary_by_day:
+        tag += "-" + date.today().isoformat()
+    return f'"{tag}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Svag jämförelse enligt RFC 9110 (W/-prefix ignoreras)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def conditional_get(*families: str, vary_by_day: bool = False) -> Callable:
+    """
+    Dependency för läs-endpoints vars svar bara beror på familjerna
+    Svaret får ETag och Last-Modified. Skickar klienten If-None-Match med
+    aktuell ETag svarar endpointen 304 innan databasen rörs.
+    If-Modified-Since används inte: Last-Modified har sekundupplösning och
+    två skrivningar inom samma sekund skulle ge ett inaktuellt 304.
+    """
+    def dependency(request: Request, response: Response):
+        etag = make_etag(families, vary_by_day)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(get_last_modified(families), usegmt=True),
+            # Webbläsaren får spara svaret men måste fråga om det varje gång
+            "Cache-Control": "no-cache",
+        }
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+
+    return dependency
+
+
+class ResponseCache:
+    """
+    Liten LRU-cache för beräknade svar. Nyckeln ska innehålla datafamiljernas
+    versioner (get_versions), så blir gamla poster aldrig träffade igen och
+    trillar ut i LRU-ordning. Värdena delas mellan requests och får inte ändras.
+    """
+
+    def __init__(self, size: int = RESPONSE_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,291 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import pandas as pd
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.database import Transaction
+from services.categorizer import TransactionCategorizer
+from services.csv_parser import create_legacy_import_hashes, frame_to_records, parse_error_count
+from services.period_rollup import PeriodRollup
+from services.rule_cache import get_rule_matcher
+from services.rule_matcher import RuleMatcher
+from services.search import index_new_transactions
+from services.suggestions import ScoredDescriptions, score_descriptions, suggest_new_transactions
+
+
+# SQLite tillåter ett begränsat antal parametrar per fråga
+HASH_CHUNK_SIZE = 500
+
+# Rader per executemany. Mellan chunkarna släpper async-importen
+# event-loopen, parameterbehandlingen för en hel fil tar annars ~1 s i ett svep.
+INSERT_CHUNK_SIZE = 2000
+
+# PRAGMA user_version: kan databasen ha rader med import_hash från före
+# öreskodningen (se create_legacy_import_hash)? Sätts av database.init_db.
+IMPORT_HASHES_MIXED = 1
+IMPORT_HASHES_ORE = 2
+
+
+def find_existing_hashes(db: Session, hashes: Iterable[str]) -> Set[str]:
+    """Hämta de import_hash som redan finns i databasen, i chunkade IN-frågor"""
+    hashes = list(hashes)
+    existing = set()
+
+    for i in range(0, len(hashes), HASH_CHUNK_SIZE):
+        chunk = hashes[i:i + HASH_CHUNK_SIZE]
+        rows = db.query(Transaction.import_hash).filter(Transaction.import_hash.in_(chunk))
+        existing.update(import_hash for (import_hash,) in rows)
+
+    return existing
+
+
+def find_existing_rows(db: Session, frame: pd.DataFrame, legacy_hashes: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Vilka rader i frame som redan finns i databasen
+    legacy_hashes (se legacy_import_hashes) slås upp för raderna som inte
+    hittades på den nya hashen. Hasharna räknas ut innan, här görs bara
+    uppslagen.
+    """
+    existing = frame['import_hash'].isin(find_existing_hashes(db, frame['import_hash'].unique()))
+
+    if legacy_hashes is not None:
+        missing = legacy_hashes[~existing]
+        existing[missing.index] = missing.isin(find_existing_hashes(db, missing.unique()))
+
+    return existing
+
+
+def has_legacy_hashes(db: Session) -> bool:
+    """Kan databasen ha rader importerade före öreskodningen av import_hash"""
+    return db.execute(text("PRAGMA user_version")).scalar() != IMPORT_HASHES_ORE
+
+
+def legacy_import_hashes(frame: pd.DataFrame) -> pd.Series:
+    """Hashen raderna hade fått före öreskodningen (se create_legacy_import_hash)"""
+    return pd.Series(
+        create_legacy_import_hashes(frame['date'], frame['amount'], frame['description']),
+        index=frame.index
+    )
+
+
+def import_transactions(
+    db: Session,
+    frame: pd.DataFrame,
+    categorizer: Optional[TransactionCategorizer] = None
+) -> Dict[str, Any]:
+    """
+    Importera en parsad DataFrame (se parse_seb_frame) i bulk
+    Dubbletter (mot databasen och inom filen) hoppas över.
+    Committar inte, det gör anroparen.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    legacy_hashes = legacy_import_hashes(frame) if has_legacy_hashes(db) else None
+    existing = find_existing_rows(db, frame, legacy_hashes)
+    timings['dedup'] = elapsed_ms(started)
+
+    matcher = categorizer.matcher if categorizer else get_rule_matcher(db)
+    rows, duplicates, scored = prepare_rows(frame, existing, categorizer, matcher, timings)
+    write_rows(db, rows, scored, timings)
+
+    return import_result(rows, duplicates, parse_error_count(frame), timings)
+
+
+async def import_transactions_async(
+    db: AsyncSession,
+    frame: pd.DataFrame,
+    categorizer: Optional[TransactionCategorizer] = None
+) -> Dict[str, Any]:
+    """
+    Som import_transactions men för AsyncSession
+    Databasarbetet körs med run_sync (I/O via aiosqlite) och hasharna,
+    kategoriseringen och förslagen i en tråd, så event-loopen blockeras inte.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    legacy_hashes = None
+    if await db.run_sync(has_legacy_hashes):
+        legacy_hashes = await asyncio.to_thread(legacy_import_hashes, frame)
+    existing = await db.run_sync(find_existing_rows, frame, legacy_hashes)
+    timings['dedup'] = elapsed_ms(started)
+
+    matcher = categorizer.matcher if categorizer else await db.run_sync(get_rule_matcher)
+    rows, duplicates, scored = await asyncio.to_thread(
+        prepare_rows, frame, existing, categorizer, matcher, timings
+    )
+    await db.run_sync(write_rows, rows, scored, timings)
+
+    return import_result(rows, duplicates, parse_error_count(frame), timings)
+
+
+def prepare_rows(
+    frame: pd.DataFrame,
+    existing: pd.Series,
+    categorizer: Optional[TransactionCategorizer],
+    matcher: RuleMatcher,
+    timings: Dict[str, float]
+) -> Tuple[List[Dict[str, Any]], int, ScoredDescriptions]:
+    """
+    Filtrera bort dubbletter, kategorisera och räkna ut kategoriförslag för
+    det som blir okategoriserat. Rör inte databasen.
+    """
+    # Dubbletter mot databasen och inom filen
+    started = time.perf_counter()
+    new_rows = frame[~existing]
+    new_rows = new_rows.drop_duplicates(subset='import_hash')
+
+    duplicates = len(frame) - len(new_rows)
+    timings['dedup'] = timings.get('dedup', 0.0) + elapsed_ms(started)
+
+    # Kategorisera automatiskt om möjligt. Redan kategoriserade rader
+    # (kolumnen category_id, se services/batch_import.py) behålls.
+    started = time.perf_counter()
+    if categorizer:
+        category_ids = categorizer.categorize_many(new_rows['description'])
+    elif 'category_id' in new_rows.columns:
+        category_ids = new_rows['category_id'].tolist()
+    else:
+        category_ids = [None] * len(new_rows)
+
+    new_rows = new_rows.assign(category_id=pd.Series(category_ids, index=new_rows.index, dtype=object))
+    rows = frame_to_records(new_rows)
+    timings['categorize'] = elapsed_ms(started)
+
+    # Kategoriförslag per beskrivning, id:na behövs först när de skrivs
+    started = time.perf_counter()
+    scored = score_descriptions(matcher, new_rows.loc[new_rows['category_id'].isna(), 'description'].tolist())
+    timings['suggest'] = elapsed_ms(started)
+
+    return rows, duplicates, scored
+
+
+def write_rows(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    scored: ScoredDescriptions,
+    timings: Dict[str, float]
+):
+    """Skriv nya rader, sökindex, kategoriförslag (se prepare_rows) och periodsummering"""
+    # Bulk-insert (executemany direkt mot tabellen, utan ORM-objekt)
+    started = time.perf_counter()
+    if rows:
+        for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+            db.execute(insert(Transaction.__table__), rows[i:i + INSERT_CHUNK_SIZE])
+        index_new_transactions(db, len(rows))
+    timings['insert'] = elapsed_ms(started)
+
+    # Kategoriförslag för det som blev okategoriserat
+    started = time.perf_counter()
+    suggest_new_transactions(db, len(rows), scored)
+    timings['suggest'] = timings.get('suggest', 0.0) + elapsed_ms(started)
+
+    # Uppdatera periodsummeringen för de perioder som berörs
+    started = time.perf_counter()
+    rollup = PeriodRollup(db)
+    rollup.add_rows(rows)
+    rollup.flush()
+    timings['rollup'] = elapsed_ms(started)
+
+
+def import_result(
+    rows: List[Dict[str, Any]],
+    duplicates: int,
+    errors: int,
+    timings: Dict[str, float]
+) -> Dict[str, Any]:
+    """errors = rader i filen som inte gick att tolka (se parse_error_count)"""
+    return {
+        'imported': len(rows),
+        'duplicates': duplicates,
+        'errors': errors,
+        'timings': timings
+    }
+
+
+def import_transaction_stream(
+    db: Session,
+    frames: Iterable[pd.DataFrame],
+    categorizer: Optional[TransactionCategorizer] = None,
+    totals: Optional[Dict[str, Any]] = None,
+    on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Importera chunk för chunk (se iter_seb_frames)
+    Varje chunk skrivs innan nästa läses, så dubblettcheck mot databasen
+    täcker även rader från tidigare chunkar i samma fil.
+    totals/on_chunk används av bakgrundsjobb för att fortsätta en avbruten
+    import och spara förloppet efter varje chunk.
+    """
+    totals = totals or new_totals()
+
+    started = time.perf_counter()
+    for frame in frames:
+        add_timing(totals, 'parse', elapsed_ms(started))
+        add_result(totals, import_transactions(db, frame, categorizer))
+        if on_chunk:
+            on_chunk(totals)
+        started = time.perf_counter()
+
+    totals['timings'] = {phase: round(ms, 3) for phase, ms in totals['timings'].items()}
+    return totals
+
+
+async def import_transaction_stream_async(
+    db: AsyncSession,
+    frames: Iterable[pd.DataFrame],
+    categorizer: Optional[TransactionCategorizer] = None
+) -> Dict[str, Any]:
+    """Som import_transaction_stream, filen läses och parsas i en tråd"""
+    totals = new_totals()
+    frames = iter(frames)
+
+    while True:
+        started = time.perf_counter()
+        frame = await asyncio.to_thread(next, frames, None)
+        if frame is None:
+            break
+        add_timing(totals, 'parse', elapsed_ms(started))
+        add_result(totals, await import_transactions_async(db, frame, categorizer))
+
+    totals['timings'] = {phase: round(ms, 3) for phase, ms in totals['timings'].items()}
+    return totals
+
+
+def new_totals() -> Dict[str, Any]:
+    return {'imported': 0, 'duplicates': 0, 'errors': 0, 'timings': {}}
+
+
+def import_summary(result: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Svar i ImportResponse-form"""
+    imported = result['imported']
+    duplicates = result['duplicates']
+    errors = result['errors']
+
+    return {
+        'imported': imported,
+        'duplicates': duplicates,
+        'errors': errors,
+        'message': f"Importerade {imported} transaktioner, {duplicates} dubbletter hoppades över, {errors} fel",
+        'timings': timings if timings is not None else result['timings']
+    }
+
+
+def add_result(totals: Dict[str, Any], result: Dict[str, Any]):
+    totals['imported'] += result['imported']
+    totals['duplicates'] += result['duplicates']
+    totals['errors'] += result['errors']
+    for phase, ms in result['timings'].items():
+        add_timing(totals, phase, ms)
+
+
+def add_timing(totals: Dict[str, Any], phase: str, ms: float):
+    totals['timings'][phase] = totals['timings'].get(phase, 0.0) + ms
+
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
@@ -0,0 +1,221 @@
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.database import Job
+from services.auto_categorizer import auto_categorize_uncategorized, auto_categorize_summary, uncategorized_query
+from services.categorizer import TransactionCategorizer
+from services.csv_parser import iter_seb_frames
+from services.importer import import_transaction_stream, import_summary, new_totals
+
+
+# Uppladdade filer sparas här tills importjobbet är klart
+UPLOAD_DIR = os.environ.get("BUDGET_UPLOAD_DIR", "./uploads")
+
+# SQLite har en skrivare åt gången, fler workers ger bara låskonflikter
+JOB_WORKERS = 1
+
+FINISHED_STATUSES = ("done", "failed")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_stopping = threading.Event()
+
+
+class JobInterrupted(Exception):
+    """Jobbet avbröts av avstängning och återupptas vid nästa start"""
+
+
+def create_job(
+    db: Session,
+    kind: str,
+    params: Dict[str, Any],
+    file_path: Optional[str] = None,
+    total_rows: Optional[int] = None
+) -> Job:
+    """Spara ett nytt jobb och lägg det i kön"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Okänd jobbtyp: {kind}")
+
+    job = Job(kind=kind, status="queued", params=params, file_path=file_path, total_rows=total_rows, state={})
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    submit_job(job.id)
+    return job
+
+
+def submit_job(job_id: int):
+    """Kör jobbet i bakgrunden"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _stopping.clear()
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="budget-job")
+        _executor.submit(_run_job, job_id)
+
+
+def resume_jobs() -> int:
+    """Lägg tillbaka jobb som avbröts av en omstart i kön. Returnerar antal."""
+    db = SessionLocal()
+    try:
+        job_ids = [
+            job_id for (job_id,) in
+            db.query(Job.id).filter(Job.status.in_(["queued", "running"])).order_by(Job.id)
+        ]
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        submit_job(job_id)
+
+    return len(job_ids)
+
+
+def shutdown_jobs():
+    """Stoppa pågående jobb efter aktuell batch (de återupptas vid nästa start)"""
+    global _executor
+    _stopping.set()
+
+    with _executor_lock:
+        executor, _executor = _executor, None
+
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def save_upload(source: BinaryIO, suffix: str = ".csv") -> str:
+    """Spara en uppladdad fil på disk och returnera sökvägen"""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=suffix)
+
+    with os.fdopen(fd, "wb") as target:
+        source.seek(0)
+        shutil.copyfileobj(source, target)
+
+    return path
+
+
+def count_data_rows(path: str) -> int:
+    """Antal rader i filen exklusive rubrikraden (uppskattning av jobbets storlek)"""
+    lines = 0
+    last = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block
+
+    # Sista raden saknar ofta radbrytning
+    if last and not last.endswith(b"\n"):
+        lines += 1
+
+    return max(lines - 1, 0)
+
+
+def _check_stopping():
+    if _stopping.is_set():
+        raise JobInterrupted()
+
+
+def _run_job(job_id: int):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return
+
+        job.status = "running"
+        job.started_at = job.started_at or datetime.utcnow()
+        db.commit()
+
+        try:
+            result = JOB_HANDLERS[job.kind](db, job)
+        except JobInterrupted:
+            db.rollback()
+            return
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+
+            job = db.get(Job, job_id)
+            job.status = "failed"
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            _remove_upload(job)
+            return
+
+        job.status = "done"
+        job.result = result
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        _remove_upload(job)
+    finally:
+        db.close()
+
+
+def _remove_upload(job: Job):
+    if job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+
+def _run_import(db: Session, job: Job) -> Dict[str, Any]:
+    """Importera en sparad CSV-fil, förloppet sparas efter varje chunk"""
+    params = job.params
+    state = dict(job.state or {})
+    chunks_done = state.pop("chunks_done", 0)
+    totals = state or new_totals()
+
+    categorizer = TransactionCategorizer(db) if params.get("auto_categorize", True) else None
+
+    def on_chunk(totals):
+        nonlocal chunks_done
+        chunks_done += 1
+        job.processed_rows = totals["imported"] + totals["duplicates"]
+        job.state = {**totals, "timings": dict(totals["timings"]), "chunks_done": chunks_done}
+        db.commit()
+        _check_stopping()
+
+    with open(job.file_path, encoding="utf-8", newline="") as stream:
+        frames = iter_seb_frames(stream, params.get("chunk_size", 5000))
+        # Redan committade chunkar hoppas över vid återupptagning
+        frames = itertools.islice(frames, chunks_done, None)
+        result = import_transaction_stream(db, frames, categorizer, totals=totals, on_chunk=on_chunk)
+
+    return import_summary(result)
+
+
+def _run_auto_categorize(db: Session, job: Job) -> Dict[str, Any]:
+    """Auto-kategorisera i batchar, förloppet sparas med varje batch"""
+    params = job.params
+    start_date = datetime.fromisoformat(params["start_date"]) if params.get("start_date") else None
+    end_date = datetime.fromisoformat(params["end_date"]) if params.get("end_date") else None
+
+    if job.total_rows is None:
+        job.total_rows = uncategorized_query(db, start_date, end_date).count()
+        db.commit()
+
+    def on_batch(state):
+        job.processed_rows = state["total_processed"]
+        job.state = dict(state)
+        db.commit()
+        _check_stopping()
+
+    state = auto_categorize_uncategorized(db, start_date, end_date, state=job.state or None, on_batch=on_batch)
+
+    return auto_categorize_summary(state)
+
+
+JOB_HANDLERS: Dict[str, Callable[[Session, Job], Dict[str, Any]]] = {
+    "import": _run_import,
+    "auto_categorize": _run_auto_categorize,
+}
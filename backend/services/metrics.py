@@ -0,0 +1,217 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from services.profiler import profile_requested, profile_request
+
+
+# Prometheus textformat (PlainTextResponse lägger till charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Hinkar för svarstid (sekunder) och antal SQL-frågor per request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Etikett för SQL utanför en request (bakgrundsjobb, uppstart)
+BACKGROUND_ROUTE = "(background)"
+
+# Routes som inte matchar någon endpoint slås ihop, annars växer antalet serier med varje URL
+UNMATCHED_ROUTE = "(unmatched)"
+
+
+class RequestStats:
+    """SQL-frågor och SQL-tid för en request (delas med trådar via contextvars)"""
+    __slots__ = ("queries", "sql_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    """Kumulativ histogram per etikettuppsättning"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], List[float]] = {}  # etiketter -> [hink..., +Inf, summa]
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+
+class MetricsRegistry:
+    """Alla mätvärden i processen, renderas av /metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries_per_request = Histogram(QUERY_COUNT_BUCKETS)
+        self.sql_seconds: Dict[str, float] = {}
+        self.queries: Dict[str, int] = {}
+        self.profiles = 0
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self.lock:
+            self.latency.observe((method, route, str(status)), seconds)
+            self.queries_per_request.observe((method, route), stats.queries)
+            self._add_sql(route, stats.queries, stats.sql_seconds)
+
+    def record_background_query(self, seconds: float):
+        with self.lock:
+            self._add_sql(BACKGROUND_ROUTE, 1, seconds)
+
+    def _add_sql(self, route: str, queries: int, seconds: float):
+        self.queries[route] = self.queries.get(route, 0) + queries
+        self.sql_seconds[route] = self.sql_seconds.get(route, 0.0) + seconds
+
+    def render(self) -> str:
+        with self.lock:
+            lines = []
+            _render_histogram(
+                lines, "budget_http_request_duration_seconds", "Svarstid per route",
+                self.latency, ("method", "route", "status")
+            )
+            _render_histogram(
+                lines, "budget_db_queries_per_request", "Antal SQL-frågor per request",
+                self.queries_per_request, ("method", "route")
+            )
+            _render_counter(lines, "budget_db_queries_total", "SQL-frågor per route", self.queries)
+            _render_counter(lines, "budget_db_query_seconds_total", "Total SQL-tid per route", self.sql_seconds)
+            lines.append("# HELP budget_profiles_total Profilerade requests")
+            lines.append("# TYPE budget_profiles_total counter")
+            lines.append(f"budget_profiles_total {self.profiles}")
+            return "\n".join(lines) + "\n"
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, histogram: Histogram, label_names: Sequence[str]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, series in sorted(histogram.series.items()):
+        base = _labels(label_names, labels)
+        for bound, count in zip(histogram.buckets, series):
+            lines.append(f'{name}_bucket{{{base},le="{bound:g}"}} {count:g}')
+        lines.append(f'{name}_bucket{{{base},le="+Inf"}} {series[-2]:g}')
+        lines.append(f"{name}_count{{{base}}} {series[-2]:g}")
+        lines.append(f"{name}_sum{{{base}}} {series[-1]:.6f}")
+
+
+def _render_counter(lines: List[str], name: str, help_text: str, values: Dict[str, float]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for route, value in sorted(values.items()):
+        lines.append(f'{name}{{route="{_escape(route)}"}} {value:g}')
+
+
+registry = MetricsRegistry()
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+def install_sql_hooks():
+    """
+    Räkna SQL-frågor och SQL-tid för alla engines (även async-enginens
+    sync_engine). Inom en request hamnar de på requestens RequestStats,
+    annars på BACKGROUND_ROUTE.
+    """
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    seconds = time.perf_counter() - started
+
+    stats = _request_stats.get()
+    if stats is None:
+        registry.record_background_query(seconds)
+    else:
+        stats.queries += 1
+        stats.sql_seconds += seconds
+
+
+class MetricsMiddleware:
+    """
+    Mäter varje request: svarstid per route, antal SQL-frågor och SQL-tid.
+    Svaret får Server-Timing (db = SQL-tid, app = hela requesten) och
+    X-DB-Queries, så N+1-frågor syns direkt i webbläsarens nätverksflik.
+    Med profilering påslagen (se services/profiler.py) ersätts svaret av en
+    profil när requesten har ?profile=1 eller headern X-Profile: 1.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if profile_requested(scope):
+            with registry.lock:
+                registry.profiles += 1
+            await profile_request(self._measure, scope, receive, send)
+            return
+
+        await self._measure(scope, receive, send)
+
+    async def _measure(self, scope, receive, send):
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f"db;dur={stats.sql_seconds * 1000:.1f}, app;dur={elapsed_ms:.1f}".encode()
+                ))
+                headers.append((b"x-db-queries", str(stats.queries).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            registry.record_request(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status,
+                time.perf_counter() - started,
+                stats
+            )
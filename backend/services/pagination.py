@@ -0,0 +1,20 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(date: datetime, transaction_id: int) -> str:
+    """Skapa en ogenomskinlig cursor för positionen (date, id)"""
+    raw = f"{date.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Tolka en cursor från encode_cursor. Kastar ValueError om den är ogiltig."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        date_str, id_str = raw.rsplit('|', 1)
+        return datetime.fromisoformat(date_str), int(id_str)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Ogiltig cursor") from e
@@ -32,6 +32,21 @@ class PeriodCalculator:
 
         return start_date, end_date
 
+    def get_period_index(self, date: datetime) -> int:
+        """
+        Löpnummer för perioden som innehåller datumet (år * 12 + månad - 1
+        för månaden då perioden startar). Används för att gruppera i SQL.
+        """
+        index = date.year * 12 + date.month - 1
+        if date.day < self.period_start_day:
+            index -= 1
+        return index
+
+    def get_period_by_index(self, index: int) -> Tuple[datetime, datetime]:
+        """Returnerar start och slut för perioden med givet löpnummer"""
+        year, month = divmod(index, 12)
+        return self.get_period_for_date(datetime(year, month + 1, self.period_start_day))
+
     def get_previous_period(self, start_date: datetime) -> Tuple[datetime, datetime]:
         """Returnerar föregående period givet en startdatum"""
         prev_start = start_date - relativedelta(months=1)
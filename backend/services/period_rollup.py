@@ -0,0 +1,314 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, case, cast, Integer, select, update, delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models.database import Transaction, Category, Period, PeriodCategory
+from services.period_calculator import PeriodCalculator
+
+
+# Fält som underhålls per (period, kategori)
+ROLLUP_FIELDS = ['total_income', 'total_expenses', 'transaction_count', 'income_count', 'expense_count']
+
+# Avvikelse som accepteras i konsistenskontrollen (flyttalsavrundning)
+TOLERANCE = 0.005
+
+
+def period_index_expression(calc: PeriodCalculator):
+    """SQL-motsvarighet till PeriodCalculator.get_period_index för Transaction.date"""
+    year = cast(func.strftime('%Y', Transaction.date), Integer)
+    month = cast(func.strftime('%m', Transaction.date), Integer)
+    day = cast(func.strftime('%d', Transaction.date), Integer)
+
+    return year * 12 + month - 1 - case((day < calc.period_start_day, 1), else_=0)
+
+
+class PeriodRollup:
+    """
+    Inkrementellt underhåll av periods/period_categories
+
+    Ändringar samlas som deltan per (period, kategori) med add/remove och
+    skrivs med flush() i anroparens transaktion. Deltan appliceras med
+    atomära UPDATE ... SET x = x + delta så att samtidiga skrivningar inte
+    skriver över varandra.
+    """
+
+    def __init__(self, db: Session, calc: Optional[PeriodCalculator] = None):
+        self.db = db
+        self.calc = calc or PeriodCalculator()
+        self.deltas: Dict[Tuple[int, int], List[float]] = defaultdict(lambda: [0.0, 0.0, 0, 0, 0])
+
+    def add(self, date: datetime, amount: float, category_id: Optional[int], sign: int = 1):
+        """Räkna med en transaktion (sign=-1 tar bort den)"""
+        delta = self.deltas[(self.calc.get_period_index(date), category_id or 0)]
+        delta[2] += sign
+
+        if amount > 0:
+            delta[0] += sign * amount
+            delta[3] += sign
+        elif amount < 0:
+            delta[1] += sign * -amount
+            delta[4] += sign
+
+    def remove(self, date: datetime, amount: float, category_id: Optional[int]):
+        """Ta bort en transaktion ur summeringen"""
+        self.add(date, amount, category_id, sign=-1)
+
+    def move(self, date: datetime, amount: float, old_category_id: Optional[int], new_category_id: Optional[int]):
+        """Flytta en transaktion mellan kategorier"""
+        if (old_category_id or 0) == (new_category_id or 0):
+            return
+        self.remove(date, amount, old_category_id)
+        self.add(date, amount, new_category_id)
+
+    def reassign_category(self, old_category_id: int, new_category_id: Optional[int]):
+        """Flytta hela kategorins summering (t.ex. när kategorin tas bort)"""
+        rows = self.db.execute(
+            select(Period.start_date, *[getattr(PeriodCategory, field) for field in ROLLUP_FIELDS])
+            .join(Period, Period.id == PeriodCategory.period_id)
+            .where(PeriodCategory.category_id == old_category_id)
+        )
+
+        for start_date, *values in rows:
+            self._move_values(self.calc.get_period_index(start_date), old_category_id, new_category_id, values)
+
+    def move_totals(self, rows: Iterable[Tuple], new_category_id: Optional[int]):
+        """Flytta summerade rader från rollup_totals_query till en annan kategori"""
+        for period_index, category_id, *values in rows:
+            self._move_values(period_index, category_id, new_category_id, values)
+
+    def _move_values(self, period_index: int, old_category_id: Optional[int], new_category_id: Optional[int], values):
+        old_delta = self.deltas[(period_index, old_category_id or 0)]
+        new_delta = self.deltas[(period_index, new_category_id or 0)]
+        for i, value in enumerate(values):
+            old_delta[i] -= value
+            new_delta[i] += value
+
+    def add_rows(self, rows: Iterable[Dict[str, Any]], sign: int = 1):
+        """Räkna med rader med nycklarna date, amount och category_id"""
+        for row in rows:
+            self.add(row['date'], row['amount'], row.get('category_id'), sign)
+
+    def flush(self):
+        """Skriv samlade deltan till databasen"""
+        deltas = {key: delta for key, delta in self.deltas.items() if any(delta)}
+        self.deltas.clear()
+        if not deltas:
+            return
+
+        period_ids = self._ensure_periods({period_index for period_index, _ in deltas})
+
+        values = [
+            {
+                'period_id': period_ids[period_index],
+                'category_id': category_id,
+                **dict(zip(ROLLUP_FIELDS, delta))
+            }
+            for (period_index, category_id), delta in deltas.items()
+        ]
+
+        stmt = insert(PeriodCategory)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PeriodCategory.period_id, PeriodCategory.category_id],
+            set_={
+                # Nollställ summan när sista raden försvinner (ingen flyttalsdrift)
+                'total_income': case(
+                    (PeriodCategory.income_count + excluded.income_count == 0, 0.0),
+                    else_=PeriodCategory.total_income + excluded.total_income
+                ),
+                'total_expenses': case(
+                    (PeriodCategory.expense_count + excluded.expense_count == 0, 0.0),
+                    else_=PeriodCategory.total_expenses + excluded.total_expenses
+                ),
+                'transaction_count': PeriodCategory.transaction_count + excluded.transaction_count,
+                'income_count': PeriodCategory.income_count + excluded.income_count,
+                'expense_count': PeriodCategory.expense_count + excluded.expense_count,
+            }
+        )
+        self.db.execute(stmt, values)
+
+        touched = list(period_ids.values())
+        self.db.execute(
+            delete(PeriodCategory)
+            .where(PeriodCategory.period_id.in_(touched), PeriodCategory.transaction_count <= 0)
+        )
+        recompute_period_totals(self.db, touched)
+
+    def _ensure_periods(self, period_indexes) -> Dict[int, int]:
+        """Skapa saknade periodrader och returnera period_index -> periods.id"""
+        starts = {}
+        values = []
+        for period_index in period_indexes:
+            start_date, end_date = self.calc.get_period_by_index(period_index)
+            starts[start_date] = period_index
+            values.append({'start_date': start_date, 'end_date': end_date})
+
+        self.db.execute(insert(Period).on_conflict_do_nothing(index_elements=[Period.start_date]), values)
+
+        rows = self.db.execute(
+            select(Period.id, Period.start_date).where(Period.start_date.in_(list(starts)))
+        )
+        return {starts[start_date]: period_id for period_id, start_date in rows}
+
+
+def recompute_period_totals(db: Session, period_ids: Optional[List[int]] = None):
+    """
+    Räkna om periodernas totaler från kategoriraderna
+    Körs efter deltan och när kategoriers typ ändras (fast/rörlig)
+    """
+    def child_sum(column, fixed_only=False):
+        query = (
+            select(func.coalesce(func.sum(column), 0))
+            .where(PeriodCategory.period_id == Period.id)
+        )
+        if fixed_only:
+            query = (
+                query.join(Category, Category.id == PeriodCategory.category_id)
+                .where(Category.type == 'fixed')
+            )
+        return query.scalar_subquery()
+
+    total_expenses = child_sum(PeriodCategory.total_expenses)
+    total_fixed = child_sum(PeriodCategory.total_expenses, fixed_only=True)
+
+    stmt = update(Period).values(
+        total_income=child_sum(PeriodCategory.total_income),
+        total_expenses=total_expenses,
+        total_fixed=total_fixed,
+        total_variable=total_expenses - total_fixed,
+        transaction_count=child_sum(PeriodCategory.transaction_count),
+        updated_at=datetime.utcnow()
+    )
+    if period_ids is not None:
+        stmt = stmt.where(Period.id.in_(period_ids))
+
+    db.execute(stmt, execution_options={'synchronize_session': False})
+
+
+def rollup_rows_query(db: Session, start_dates: List[datetime]):
+    """
+    Kategorirader för givna perioder, i samma form som aggregatfrågan i
+    routers/periods.py så att samma svarsbyggare kan användas
+    """
+    return (
+        db.query(
+            Period.start_date,
+            PeriodCategory.category_id,
+            Category.name.label('category_name'),
+            Category.type.label('category_type'),
+            Category.budget_limit,
+            Category.color,
+            case((Category.type == 'fixed', 'fixed'), else_='variable').label('expense_kind'),
+            PeriodCategory.transaction_count,
+            PeriodCategory.expense_count,
+            case((PeriodCategory.income_count > 0, PeriodCategory.total_income)).label('income'),
+            PeriodCategory.total_expenses.label('expenses'),
+        )
+        .join(Period, Period.id == PeriodCategory.period_id)
+        .outerjoin(Category, Category.id == PeriodCategory.category_id)
+        .filter(Period.start_date.in_(start_dates))
+    )
+
+
+def rollup_totals_query(calc: PeriodCalculator, *criteria):
+    """(period_index, category_id, ROLLUP_FIELDS...) per period och kategori för transaktioner som matchar criteria"""
+    period_index = period_index_expression(calc).label('period_index')
+    category_id = func.coalesce(Transaction.category_id, 0)
+
+    return (
+        select(
+            period_index,
+            category_id.label('category_id'),
+            func.coalesce(func.sum(case((Transaction.amount > 0, Transaction.amount))), 0.0),
+            func.coalesce(func.sum(case((Transaction.amount < 0, -Transaction.amount))), 0.0),
+            func.count(Transaction.id),
+            func.count(case((Transaction.amount > 0, 1))),
+            func.count(case((Transaction.amount < 0, 1))),
+        )
+        .where(*criteria)
+        .group_by(period_index, category_id)
+    )
+
+
+def compute_rollup_from_transactions(db: Session, calc: PeriodCalculator) -> Dict[Tuple[int, int], List[float]]:
+    """Räkna fram alla (period, kategori)-summor direkt från transaktionerna i en fråga"""
+    rows = db.execute(rollup_totals_query(calc))
+
+    return {(row[0], row[1]): list(row[2:]) for row in rows}
+
+
+def rebuild_rollup(db: Session, calc: Optional[PeriodCalculator] = None) -> int:
+    """Bygg om hela summeringen från transaktionerna. Returnerar antal perioder."""
+    rollup = PeriodRollup(db, calc)
+
+    db.execute(delete(PeriodCategory))
+    db.execute(delete(Period))
+
+    rollup.deltas.update(compute_rollup_from_transactions(db, rollup.calc))
+    period_count = len({period_index for period_index, _ in rollup.deltas})
+    rollup.flush()
+
+    return period_count
+
+
+def check_rollup(db: Session, calc: Optional[PeriodCalculator] = None) -> List[Dict[str, Any]]:
+    """
+    Jämför summeringen mot transaktionerna
+    Returnerar en lista med avvikelser (tom lista = konsistent)
+    """
+    calc = calc or PeriodCalculator()
+    expected = compute_rollup_from_transactions(db, calc)
+
+    actual = {}
+    rows = db.execute(
+        select(Period.start_date, PeriodCategory.category_id, *[getattr(PeriodCategory, f) for f in ROLLUP_FIELDS])
+        .join(Period, Period.id == PeriodCategory.period_id)
+    )
+    for row in rows:
+        actual[(calc.get_period_index(row[0]), row[1])] = list(row[2:])
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        expected_values = expected.get(key, [0.0, 0.0, 0, 0, 0])
+        actual_values = actual.get(key, [0.0, 0.0, 0, 0, 0])
+
+        for field, want, have in zip(ROLLUP_FIELDS, expected_values, actual_values):
+            if abs((want or 0) - (have or 0)) > TOLERANCE:
+                mismatches.append({
+                    'period_start': calc.get_period_by_index(key[0])[0].isoformat(),
+                    'category_id': key[1],
+                    'field': field,
+                    'expected': want,
+                    'actual': have
+                })
+
+    # Periodtotalerna ska stämma med kategoriraderna
+    totals = db.execute(
+        select(Period.start_date, Period.transaction_count, func.coalesce(func.sum(PeriodCategory.transaction_count), 0))
+        .outerjoin(PeriodCategory, PeriodCategory.period_id == Period.id)
+        .group_by(Period.id)
+    )
+    for start_date, period_count, child_count in totals:
+        if (period_count or 0) != child_count:
+            mismatches.append({
+                'period_start': start_date.isoformat(),
+                'category_id': None,
+                'field': 'transaction_count',
+                'expected': child_count,
+                'actual': period_count
+            })
+
+    return mismatches
+
+
+def ensure_rollup(db: Session):
+    """Bygg summeringen om den saknas men det finns transaktioner (t.ex. efter uppgradering)"""
+    has_periods = db.query(Period.id).first() is not None
+    has_transactions = db.query(Transaction.id).first() is not None
+
+    if has_transactions and not has_periods:
+        rebuild_rollup(db)
+        db.commit()
@@ -0,0 +1,183 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+
+# Profilering är avstängd om inte BUDGET_PROFILING=1, en profil visar
+# kod och tider och ska inte kunna begäras av vem som helst i produktion
+PROFILING_ENABLED = os.environ.get("BUDGET_PROFILING", "").lower() in ("1", "true", "yes")
+
+# Sekunder mellan samplingarna
+PROFILE_INTERVAL = float(os.environ.get("BUDGET_PROFILE_INTERVAL", "0.001"))
+
+# Antal rader per tabell i rapporten
+PROFILE_TOP = 40
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stackar räknas bara om de kör requestkod, inte lediga trådar i trådpoolen
+# eller event-loopen som väntar på I/O
+_FRAMEWORK_DIRS = (os.sep + "fastapi" + os.sep, os.sep + "starlette" + os.sep)
+_SKIP_FILES = (os.path.abspath(__file__), os.path.join(BACKEND_DIR, "services", "metrics.py"))
+
+# Trådar som står och väntar (lås, kö, select) räknas inte, de använder ingen CPU
+_WAIT_FILES = tuple(os.sep + name for name in ("threading.py", "queue.py", "selectors.py"))
+
+# En profil i taget (samplingen ser alla trådar)
+_profile_lock = threading.Lock()
+
+Location = Tuple[str, int, str]
+
+
+class SamplingProfiler:
+    """
+    Samplar stackarna i alla trådar med jämna mellanrum i en egen tråd
+    Till skillnad från cProfile syns både event-loopen (async endpoints,
+    serialisering) och trådpoolen (sync endpoints, run_sync, to_thread).
+    Samtidiga requests hamnar i samma profil.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Dict[Location, int] = {}
+        self.total_counts: Dict[Location, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._switch_interval = sys.getswitchinterval()
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        # Sampletråden får annars bara GIL:en var 5:e ms när requesten räknar
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._sample(frame)
+
+    def _sample(self, frame):
+        stack = []
+        in_request = False
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename in _SKIP_FILES:
+                frame = frame.f_back
+                continue
+            if not in_request:
+                if code.co_filename.startswith(BACKEND_DIR):
+                    in_request = code.co_name != "<module>"
+                else:
+                    in_request = any(part in code.co_filename for part in _FRAMEWORK_DIRS)
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+
+        if not in_request or not stack or stack[0][0].endswith(_WAIT_FILES):
+            return
+
+        self.samples += 1
+        self.self_counts[stack[0]] = self.self_counts.get(stack[0], 0) + 1
+        for location in set(stack):
+            self.total_counts[location] = self.total_counts.get(location, 0) + 1
+
+    def report(self, top: int = PROFILE_TOP) -> str:
+        """Textrapport: funktioner efter inkluderande och egen tid"""
+        ms_per_sample = self.elapsed * 1000 / self.samples if self.samples else 0.0
+        lines = [
+            f"{self.samples} samplingar på {self.elapsed * 1000:.1f} ms (intervall {self.interval * 1000:g} ms)",
+            "",
+        ]
+        for title, counts in (("Inkluderande tid", self.total_counts), ("Egen tid", self.self_counts)):
+            lines.append(f"{title}:")
+            lines.append(f"{'samplingar':>10} {'andel':>7} {'~ms':>9}  funktion")
+            for location, count in sorted(counts.items(), key=lambda item: -item[1])[:top]:
+                share = count / self.samples * 100
+                lines.append(f"{count:>10} {share:>6.1f}% {count * ms_per_sample:>9.1f}  {_format_location(location)}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+def _format_location(location: Location) -> str:
+    filename, line, name = location
+    if filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    else:
+        # Bibliotek: visa sökvägen från paketnamnet (.../site-packages/x/y.py -> x/y.py)
+        parts = filename.split(os.sep)
+        if "site-packages" in parts:
+            filename = os.sep.join(parts[parts.index("site-packages") + 1:])
+    return f"{name} ({filename}:{line})"
+
+
+def profile_requested(scope) -> bool:
+    """?profile=1 eller headern X-Profile: 1, bara med BUDGET_PROFILING påslaget"""
+    if not PROFILING_ENABLED:
+        return False
+
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile" and value.strip() in (b"1", b"true"):
+            return True
+
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[-1] in ("1", "true")
+
+
+async def profile_request(app, scope, receive, send):
+    """
+    Kör requesten med SamplingProfiler och svara med profilen (text/plain)
+    i stället för endpointens svar. Status och storlek på det egentliga
+    svaret står i rapportens första rad och i X-Profiled-Status.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        # En profil pågår redan, kör requesten som vanligt
+        await app(scope, receive, send)
+        return
+
+    status = 500
+    body_size = 0
+
+    async def capture(message):
+        nonlocal status, body_size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body_size += len(message.get("body", b""))
+
+    profiler = SamplingProfiler()
+    try:
+        profiler.start()
+        try:
+            await app(scope, receive, capture)
+        finally:
+            profiler.stop()
+    finally:
+        _profile_lock.release()
+
+    report = f"{scope['method']} {scope['path']} -> {status}, {body_size} byte\n{profiler.report()}"
+    body = report.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-profiled-status", str(status).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
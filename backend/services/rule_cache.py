@@ -0,0 +1,69 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from models.database import CategoryRule
+from services.rule_matcher import RuleMatcher
+
+
+# Processgemensam cache av kompilerade regler. Versionen räknas upp vid
+# varje ändring av category_rules så att nästa anrop bygger om matchningen.
+_lock = threading.Lock()
+_rules_version = 0
+_cached: Optional[Tuple[int, RuleMatcher]] = None
+
+
+def get_rules_version() -> int:
+    """Returnerar aktuell version av regeluppsättningen"""
+    return _rules_version
+
+
+def bump_rules_version() -> int:
+    """Markera att reglerna har ändrats (anropas efter commit)"""
+    global _rules_version
+    with _lock:
+        _rules_version += 1
+        return _rules_version
+
+
+def load_rule_tuples(db: Session) -> list:
+    """Hämta regler sorterade efter prioritet som (pattern, pattern_type, category_id)"""
+    return (
+        db.query(CategoryRule.pattern, CategoryRule.pattern_type, CategoryRule.category_id)
+        .order_by(CategoryRule.priority.desc())
+        .all()
+    )
+
+
+def get_rule_matcher(db: Session) -> RuleMatcher:
+    """
+    Hämta kompilerad matchning för aktuell regelversion
+    Reglerna läses från databasen bara när versionen har ändrats
+    """
+    global _cached
+
+    cached = _cached
+    version = _rules_version
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    # Versionen läses före laddningen: ändras reglerna under tiden
+    # sparas matchningen under den gamla versionen och byggs om nästa gång
+    matcher = RuleMatcher(tuple(rule) for rule in load_rule_tuples(db))
+
+    with _lock:
+        if _cached is None or _cached[0] <= version:
+            _cached = (version, matcher)
+
+    return matcher
+
+
+def get_rule_cache_stats() -> Dict[str, Any]:
+    """Regelversion och memo-statistik för den cachade matchningen"""
+    cached = _cached
+    stats = {"version": _rules_version, "cached_version": None, "rules": 0}
+    if cached is None:
+        return stats
+
+    version, matcher = cached
+    return {**stats, "cached_version": version, "rules": len(matcher), **matcher.memo_info()}
@@ -0,0 +1,166 @@
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# (pattern, pattern_type, category_id) i prioritetsordning
+RuleTuple = Tuple[str, str, int]
+
+# Max antal beskrivningar i matchningens memo
+MATCH_MEMO_SIZE = 20000
+
+
+class _SubstringAutomaton:
+    """
+    Aho-Corasick-automat för substring-regler
+
+    Alla mönster matchas i ett enda pass över beskrivningen. Varje nod
+    håller den lägsta regelrangen (= högsta prioritet) bland mönstren som
+    slutar där, så att första träff i regelordning kan hittas direkt.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, int]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.best: List[Optional[int]] = [None]
+
+        for pattern, rank in patterns:
+            self._add(pattern, rank)
+
+        self._build_failure_links()
+
+    def _add(self, pattern: str, rank: int):
+        node = 0
+        for char in pattern:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+                self.goto[node][char] = next_node
+            node = next_node
+
+        if self.best[node] is None or rank < self.best[node]:
+            self.best[node] = rank
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+
+                # Ärv bästa rang från suffix-noden så att varje nod täcker
+                # alla mönster som slutar på den positionen
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+
+    def best_rank(self, text: str) -> Optional[int]:
+        """Returnerar lägsta rang bland mönster som förekommer i texten"""
+        goto = self.goto
+        fail = self.fail
+        best = self.best
+
+        found = best[0]  # Tomt mönster matchar alltid
+        if found == 0:
+            return found
+
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            rank = best[node]
+            if rank is not None and (found is None or rank < found):
+                found = rank
+                if found == 0:
+                    break
+
+        return found
+
+
+class RuleMatcher:
+    """
+    Kompilerad matchning av kategoriseringsregler
+
+    Byggs en gång per regeluppsättning. Substring-regler matchas med en
+    Aho-Corasick-automat och regex-regler är förkompilerade. Resultatet är
+    detsamma som att gå igenom reglerna i ordning och ta första träffen.
+
+    Samma butikstext återkommer hundratals gånger, så resultatet memoiseras
+    per beskrivning (LRU). Memot hör till instansen: en ny regelversion ger
+    en ny RuleMatcher och därmed ett tomt memo.
+    """
+
+    def __init__(self, rules: Iterable[RuleTuple], memo_size: int = MATCH_MEMO_SIZE):
+        self.rules: List[RuleTuple] = list(rules)
+        self.category_ids: List[int] = [category_id for _, _, category_id in self.rules]
+        self._patterns = {(pattern, category_id) for pattern, _, category_id in self.rules}
+
+        substrings = []
+        self.regexes: List[Tuple[int, re.Pattern]] = []
+
+        for rank, (pattern, pattern_type, _) in enumerate(self.rules):
+            if pattern_type == "substring":
+                substrings.append((pattern.lower(), rank))
+            elif pattern_type == "regex":
+                try:
+                    self.regexes.append((rank, re.compile(pattern, re.IGNORECASE)))
+                except re.error:
+                    continue  # Ogiltigt mönster kan aldrig matcha
+
+        self.automaton = _SubstringAutomaton(substrings) if substrings else None
+
+        # Nyckeln är beskrivningen oförändrad eftersom regex-reglerna ser originaltexten
+        self._memo = lru_cache(maxsize=memo_size)(self._match)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def has_rule(self, pattern: str, category_id: int) -> bool:
+        """Finns en regel med exakt detta mönster för kategorin"""
+        return (pattern, category_id) in self._patterns
+
+    def match(self, description: str) -> Optional[int]:
+        """Returnerar category_id för första matchande regel eller None"""
+        return self._memo(description)
+
+    def memo_info(self) -> Dict[str, int]:
+        """Träffar, missar och storlek för memot"""
+        info = self._memo.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+    def _match(self, description: str) -> Optional[int]:
+        rank = None
+        if self.automaton is not None:
+            rank = self.automaton.best_rank(description.lower())
+
+        # Regex-regler behöver bara provas om de har högre prioritet
+        # än den bästa substring-träffen
+        for regex_rank, regex in self.regexes:
+            if rank is not None and regex_rank > rank:
+                break
+            if regex.search(description):
+                rank = regex_rank
+                break
+
+        if rank is None:
+            return None
+
+        return self.category_ids[rank]
+
+    def match_many(self, descriptions: Iterable[str]) -> List[Optional[int]]:
+        """Kategorisera flera beskrivningar"""
+        match = self._memo
+        return [match(description) for description in descriptions]
@@ -0,0 +1,127 @@
+import re
+from typing import Any, Dict, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from models.database import Category, Transaction
+from services.period_rollup import PeriodRollup, rollup_totals_query
+from services.search import description_filter
+from services.transaction_columns import IDS_RECORDED_OPTION, record_transaction_changes
+
+
+# Antal exempeltransaktioner i förhandsvisningen
+PREVIEW_SAMPLE_SIZE = 20
+
+
+def rule_filter(pattern: str, pattern_type: str = "substring"):
+    """
+    SQL-filter som matchar samma transaktioner som regeln i RuleMatcher
+    Substring går via fulltextindexet (trigram), regex via py_regexp
+    (registreras i db_config.py).
+    """
+    if pattern_type == "substring":
+        return description_filter(pattern)
+
+    if pattern_type == "regex":
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Ogiltigt reguljärt uttryck: {e}")
+        return func.py_regexp(pattern, Transaction.description) == 1
+
+    raise ValueError(f"Okänd regeltyp: {pattern_type}")
+
+
+def affected_filter(category_id: int, pattern: str, pattern_type: str = "substring"):
+    """Matchande transaktioner som regeln skulle flytta (ej manuella, annan kategori)"""
+    return and_(
+        rule_filter(pattern, pattern_type),
+        Transaction.is_manually_categorized.isnot(True),
+        or_(Transaction.category_id.is_(None), Transaction.category_id != category_id)
+    )
+
+
+def preview_rule(
+    db: Session,
+    category_id: int,
+    pattern: str,
+    pattern_type: str = "substring",
+    sample_size: int = PREVIEW_SAMPLE_SIZE
+) -> Dict[str, Any]:
+    """
+    Vilka befintliga transaktioner en regel skulle påverka
+    Räknas med en aggregatfråga, inga transaktioner laddas utom exemplen.
+    """
+    # En grupperad fråga ger alla antal (regex kräver en full genomläsning per fråga)
+    manual = func.coalesce(Transaction.is_manually_categorized, False)
+    groups = db.execute(
+        select(Transaction.category_id, Category.name, manual, func.count(Transaction.id))
+        .outerjoin(Category, Category.id == Transaction.category_id)
+        .where(rule_filter(pattern, pattern_type))
+        .group_by(Transaction.category_id, manual)
+    ).all()
+
+    by_category: Dict[Optional[int], Dict[str, Any]] = {}
+    counts = {"matched": 0, "unchanged": 0, "manual": 0}
+    for current_id, name, is_manual, count in groups:
+        counts["matched"] += count
+        if current_id == category_id:
+            counts["unchanged"] += count
+        elif is_manual:
+            counts["manual"] += count
+        else:
+            entry = by_category.setdefault(current_id, {"category_id": current_id, "category_name": name, "count": 0})
+            entry["count"] += count
+
+    affected = affected_filter(category_id, pattern, pattern_type)
+    to_update = sum(entry["count"] for entry in by_category.values())
+    samples = []
+    if to_update and sample_size:
+        samples = (
+            db.query(Transaction)
+            .options(selectinload(Transaction.category), selectinload(Transaction.suggestions))
+            .filter(affected)
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+            .limit(sample_size)
+            .all()
+        )
+
+    return {
+        **counts,
+        "to_update": to_update,
+        "uncategorized": by_category[None]["count"] if None in by_category else 0,
+        "by_category": sorted(by_category.values(), key=lambda entry: -entry["count"]),
+        "samples": samples
+    }
+
+
+def apply_rule(
+    db: Session,
+    category_id: int,
+    pattern: str,
+    pattern_type: str = "substring",
+    rollup: Optional[PeriodRollup] = None
+) -> int:
+    """
+    Kategorisera om alla matchande, ej manuellt kategoriserade transaktioner
+    med en UPDATE. Periodsummeringen flyttas med en aggregatfråga över
+    samma rader. Committar inte. Returnerar antal ändrade transaktioner.
+    """
+    rollup = rollup or PeriodRollup(db)
+    affected = affected_filter(category_id, pattern, pattern_type)
+
+    # Summeringen läses före uppdateringen, då har raderna sina gamla kategorier
+    rollup.move_totals(db.execute(rollup_totals_query(rollup.calc, affected)), category_id)
+
+    # Id:n från RETURNING till kolumnbilden, annars läser den om samma filter
+    updated_ids = db.execute(
+        update(Transaction.__table__)
+        .where(affected)
+        .values(category_id=category_id)
+        .returning(Transaction.__table__.c.id),
+        execution_options={IDS_RECORDED_OPTION: True}
+    ).scalars().all()
+    record_transaction_changes(db, updated_ids)
+    rollup.flush()
+
+    return len(updated_ids)
@@ -0,0 +1,109 @@
+from sqlalchemy import event, func, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models.database import Transaction
+
+
+# Fulltextindex (FTS5, trigram) som speglar transactions.description.
+# Borttagningar och ändringar synkas med triggers. Nya rader indexeras av
+# skrivvägarna: ORM-inserts via after_insert nedan och bulkimporten med en
+# enda INSERT ... SELECT (en radvis insert-trigger gör importen ~3x långsammare).
+FTS_TABLE = "transactions_fts"
+
+# Trigram kräver minst tre tecken, kortare söktermer går via LIKE
+MIN_FTS_TERM_LENGTH = 3
+
+_fts_available = False
+
+_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description,
+        content='transactions',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+
+def ensure_search_index(connection: Connection) -> bool:
+    """
+    Skapa fulltextindexet och dess triggers om de saknas, och bygg om det
+    om antalet rader inte stämmer (t.ex. inserts utanför appen).
+    Returnerar False om SQLite saknar FTS5/trigram, då används LIKE.
+    """
+    global _fts_available
+
+    try:
+        for statement in _FTS_DDL:
+            connection.execute(text(statement))
+
+        indexed = connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}_docsize")).scalar()
+        total = connection.execute(text("SELECT count(*) FROM transactions")).scalar()
+        if indexed != total:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except Exception as e:
+        print(f"Fulltextsökning ej tillgänglig, använder LIKE: {e}")
+        _fts_available = False
+        return False
+
+    _fts_available = True
+    return True
+
+
+def index_new_transactions(db: Session, count: int):
+    """
+    Indexera de senast insatta raderna efter en bulk-insert
+    Anropas i samma transaktion direkt efter inserten. Skrivlåset hålls då,
+    så de nya raderna är de `count` raderna med högst id.
+    """
+    if not _fts_available or count <= 0:
+        return
+
+    # Raderna läses i stigande rowid-ordning, FTS5 skriver då mycket snabbare
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, description) "
+            f"SELECT id, description FROM transactions "
+            f"WHERE id > (SELECT max(id) FROM transactions) - :count"
+        ),
+        {"count": count}
+    )
+
+
+@event.listens_for(Transaction, "after_insert")
+def _index_inserted_transaction(mapper, connection, target):
+    """Indexera transaktioner som skapas via ORM"""
+    if _fts_available:
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (:id, :description)"),
+            {"id": target.id, "description": target.description}
+        )
+
+
+def description_filter(term: str):
+    """
+    Filter för skiftlägesokänslig delsträngssökning i beskrivningen
+    Går via fulltextindexet när det finns och termen är tillräckligt lång.
+    """
+    if _fts_available and len(term) >= MIN_FTS_TERM_LENGTH:
+        # Citerad fras: trigram-matchning av hela termen = delsträngssökning
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase)
+        return Transaction.id.in_(matches)
+
+    # py_lower registreras i db_config.py och klarar å/ä/ö
+    return func.py_lower(Transaction.description).contains(term.lower(), autoescape=True)
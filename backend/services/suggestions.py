@@ -0,0 +1,232 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models.database import Transaction, TransactionSuggestion
+from services.classifier import get_category_model
+from services.rule_cache import get_rule_matcher
+from services.rule_matcher import RuleMatcher
+
+
+# Förslag per transaktion och lägsta poäng för att spara ett förslag
+SUGGESTION_COUNT = 3
+MIN_SUGGESTION_SCORE = 0.1
+
+# En regel där bara en del av orden finns i beskrivningen väger lägre än en träff
+NEAR_MISS_WEIGHT = 0.8
+
+# Transaktioner per batch vid omräkning (en commit per batch)
+SUGGESTION_BATCH_SIZE = 2000
+
+# SQLite tillåter ett begränsat antal parametrar per fråga
+DELETE_CHUNK_SIZE = 500
+
+# Rader per executemany, så att async-importen släpper event-loopen mellan chunkarna
+INSERT_CHUNK_SIZE = 2000
+
+# Ord = minst två bokstäver (siffror är oftast butiksnummer eller datum)
+_WORD_RE = re.compile(r"[^\W\d_]{2,}")
+
+# Förslag gäller bara okategoriserade transaktioner. Triggers tar bort dem
+# när transaktionen kategoriseras eller tas bort, oavsett skrivväg.
+_TRIGGER_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS transaction_suggestions_categorized
+    AFTER UPDATE OF category_id ON transactions WHEN new.category_id IS NOT NULL BEGIN
+        DELETE FROM transaction_suggestions WHERE transaction_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transaction_suggestions_ad AFTER DELETE ON transactions BEGIN
+        DELETE FROM transaction_suggestions WHERE transaction_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transaction_suggestions_category_ad AFTER DELETE ON categories BEGIN
+        DELETE FROM transaction_suggestions WHERE category_id = old.id;
+    END
+    """,
+]
+
+_near_miss_cache: Optional[Tuple[RuleMatcher, "_NearMissIndex"]] = None
+
+
+def ensure_suggestion_triggers(connection: Connection):
+    """Skapa triggers som håller förslagen i takt med transaktionerna"""
+    for statement in _TRIGGER_DDL:
+        connection.execute(text(statement))
+
+
+class _NearMissIndex:
+    """
+    Inverterat index ord -> substring-regler
+    Hittar regler där en del av orden finns i beskrivningen, t.ex. regeln
+    "ICA SUPERMARKET" för "ICA NARA" (poäng 0.5).
+    """
+
+    def __init__(self, matcher: RuleMatcher):
+        self.words: Dict[str, List[int]] = {}
+        self.rules: List[Tuple[int, int]] = []  # (category_id, antal ord)
+
+        for pattern, pattern_type, category_id in matcher.rules:
+            words = set(_WORD_RE.findall(pattern.lower())) if pattern_type == "substring" else set()
+            if not words:
+                continue
+
+            for word in words:
+                self.words.setdefault(word, []).append(len(self.rules))
+            self.rules.append((category_id, len(words)))
+
+    def scores(self, description: str) -> Dict[int, float]:
+        """Andel av regelns ord som finns i beskrivningen, bästa regeln per kategori"""
+        hits: Dict[int, int] = {}
+        for word in set(_WORD_RE.findall(description.lower())):
+            for rule in self.words.get(word, ()):
+                hits[rule] = hits.get(rule, 0) + 1
+
+        scores: Dict[int, float] = {}
+        for rule, count in hits.items():
+            category_id, total = self.rules[rule]
+            scores[category_id] = max(scores.get(category_id, 0.0), count / total)
+
+        return scores
+
+
+def _get_near_miss_index(matcher: RuleMatcher) -> _NearMissIndex:
+    """Indexet byggs om när regelcachen ger en ny matchning"""
+    global _near_miss_cache
+    cached = _near_miss_cache
+    if cached is None or cached[0] is not matcher:
+        cached = (matcher, _NearMissIndex(matcher))
+        _near_miss_cache = cached
+    return cached[1]
+
+
+# Topp-förslag per beskrivning: [(category_id, poäng), ...]
+ScoredDescriptions = Dict[str, List[Tuple[int, float]]]
+
+
+def score_descriptions(matcher: RuleMatcher, descriptions: Sequence[str]) -> ScoredDescriptions:
+    """
+    Topp-förslag per unik beskrivning. Poängen är den högsta av:
+    - 1.0 om en regel matchar (t.ex. import utan auto-kategorisering)
+    - modellens sannolikhet (liknande manuellt kategoriserade beskrivningar)
+    - andelen matchande ord i en regel x NEAR_MISS_WEIGHT
+    Rör inte databasen, importen kör den i en tråd innan raderna skrivs.
+    """
+    descriptions = list(dict.fromkeys(descriptions))
+    if not descriptions:
+        return {}
+
+    near_miss = _get_near_miss_index(matcher)
+    rule_matches = matcher.match_many(descriptions)
+    model_ids, model_scores = get_category_model().predict_top(descriptions, SUGGESTION_COUNT)
+
+    scored = {}
+    for description, rule_match, category_ids, scores in zip(
+        descriptions, rule_matches, model_ids.tolist(), model_scores.tolist()
+    ):
+        candidates = {category_id: score for category_id, score in zip(category_ids, scores) if score > 0}
+
+        for category_id, score in near_miss.scores(description).items():
+            candidates[category_id] = max(candidates.get(category_id, 0.0), score * NEAR_MISS_WEIGHT)
+
+        if rule_match is not None:
+            candidates[rule_match] = 1.0
+
+        best = sorted(candidates.items(), key=lambda item: -item[1])[:SUGGESTION_COUNT]
+        scored[description] = [
+            (category_id, round(score, 4)) for category_id, score in best if score >= MIN_SUGGESTION_SCORE
+        ]
+
+    return scored
+
+
+def suggestion_values(rows: Sequence[Tuple[int, str]], scored: ScoredDescriptions) -> List[Dict[str, Any]]:
+    """Rader till transaction_suggestions för (id, beskrivning)"""
+    return [
+        {"transaction_id": transaction_id, "rank": rank, "category_id": category_id, "score": score}
+        for transaction_id, description in rows
+        for rank, (category_id, score) in enumerate(scored[description])
+    ]
+
+
+def compute_suggestions(db: Session, rows: Sequence[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """Topp-förslag för (id, beskrivning), se score_descriptions"""
+    if not rows:
+        return []
+
+    # Samma butikstext återkommer ofta, varje unik beskrivning räknas en gång
+    scored = score_descriptions(get_rule_matcher(db), [description for _, description in rows])
+    return suggestion_values(rows, scored)
+
+
+def store_suggestions(db: Session, rows: Sequence[Tuple[int, str]], replace: bool = True) -> int:
+    """Räkna ut och spara förslag för (id, beskrivning). Returnerar antal förslag."""
+    if replace:
+        ids = [transaction_id for transaction_id, _ in rows]
+        for i in range(0, len(ids), DELETE_CHUNK_SIZE):
+            db.execute(
+                delete(TransactionSuggestion)
+                .where(TransactionSuggestion.transaction_id.in_(ids[i:i + DELETE_CHUNK_SIZE]))
+            )
+
+    return _insert_suggestions(db, compute_suggestions(db, rows))
+
+
+def suggest_new_transactions(db: Session, count: int, scored: Optional[ScoredDescriptions] = None) -> int:
+    """
+    Förslag för de senast bulk-insatta raderna (samma antagande som
+    index_new_transactions: de nya raderna har högst id)
+    scored är förslagen som importen redan räknat ut per beskrivning, då
+    återstår bara att slå upp id:na och skriva.
+    """
+    if count <= 0:
+        return 0
+
+    newest = select(func.max(Transaction.id)).scalar_subquery()
+    rows = db.execute(
+        select(Transaction.id, Transaction.description)
+        .where(Transaction.id > newest - count, Transaction.category_id.is_(None))
+    ).all()
+
+    if scored is None:
+        return store_suggestions(db, rows, replace=False)
+
+    missing = [description for _, description in rows if description not in scored]
+    if missing:
+        scored = {**scored, **score_descriptions(get_rule_matcher(db), missing)}
+    return _insert_suggestions(db, suggestion_values(rows, scored))
+
+
+def _insert_suggestions(db: Session, values: List[Dict[str, Any]]) -> int:
+    for i in range(0, len(values), INSERT_CHUNK_SIZE):
+        db.execute(insert(TransactionSuggestion.__table__), values[i:i + INSERT_CHUNK_SIZE])
+    return len(values)
+
+
+def refresh_suggestions(db: Session, batch_size: int = SUGGESTION_BATCH_SIZE) -> Dict[str, int]:
+    """Räkna om förslagen för alla okategoriserade transaktioner, en commit per batch"""
+    last_id = 0
+    transactions = 0
+    suggestions = 0
+
+    while True:
+        rows = db.execute(
+            select(Transaction.id, Transaction.description)
+            .where(Transaction.category_id.is_(None), Transaction.id > last_id)
+            .order_by(Transaction.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        suggestions += store_suggestions(db, rows)
+        transactions += len(rows)
+        last_id = rows[-1].id
+        db.commit()
+
+    return {"transactions": transactions, "suggestions": suggestions}
+
@@ -0,0 +1,359 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import Integer, cast, event, func, select
+from sqlalchemy.orm import Session, object_session
+
+from models.database import Transaction
+from models.money import STORED_IN_ORE, stored_expression
+
+
+# Minnesbudget för ögonblicksbilden. Ryms inte tabellen används SQL som tidigare.
+MEMORY_BUDGET_MB = int(os.environ.get("BUDGET_COLUMNS_MAX_MB", "64"))
+
+# Bytes per rad: dag och belopp i ören (8 + 8), id, kategori, aggregatnyckel och id-index (4 * 4), konto (2).
+# Standardbudgeten räcker till ungefär två miljoner transaktioner.
+BYTES_PER_ROW = 34
+
+# Rader per IN-fråga när ändrade transaktioner läses om
+FETCH_CHUNK_SIZE = 500
+
+# Execution option för bulk-UPDATE/DELETE där anroparen själv anger id:na
+# med record_transaction_changes (annars läses de med ett SELECT på villkoret)
+IDS_RECORDED_OPTION = "transaction_ids_recorded"
+
+_EPOCH = datetime(1970, 1, 1)
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+_PENDING_KEY = "transaction_columns_changes"
+
+
+class TransactionColumns:
+    """
+    Ögonblicksbild av transaktionerna som NumPy-kolumner, sorterade på datum
+    (sedan id). Datumen lagras som dagar sedan 1970-01-01, beloppen som hela
+    ören (int64, summorna blir exakta), okategoriserade rader har kategori 0
+    och kontona är index i account_names.
+    Bilden ändras aldrig efter att den byggts, ändringar ger en ny bild.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        ids: np.ndarray,
+        days: np.ndarray,
+        amounts: np.ndarray,
+        category_ids: np.ndarray,
+        accounts: np.ndarray,
+        account_names: List[str],
+        id_order: Optional[np.ndarray] = None
+    ):
+        self.version = version
+        self.ids = ids
+        self.days = days
+        self.amounts = amounts
+        self.category_ids = category_ids
+        self.accounts = accounts
+        self.account_names = account_names
+        # Nyckel per (kategori, tecken) för bincount: jämna = inkomst, udda = utgift
+        self.keys = category_ids * 2 + (amounts < 0)
+        # Positioner i id-ordning, för att hitta ändrade rader med searchsorted
+        self.id_order = id_order if id_order is not None else np.argsort(ids, kind="stable").astype(np.int32)
+        self.max_id = int(ids.max()) if len(ids) else 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (
+            self.ids, self.days, self.amounts, self.category_ids, self.keys, self.accounts, self.id_order
+        ))
+
+    def date_slice(self, start_date: datetime, end_date: datetime) -> slice:
+        """Raderna med start_date <= datum <= end_date (transaktioner har bara datum, ingen tid)"""
+        start_day = _to_day(start_date)
+        if start_date > _from_day(start_day):
+            start_day += 1  # Start mitt på dagen: dagens transaktioner (kl 00:00) ligger före
+        lo = np.searchsorted(self.days, start_day, side="left")
+        hi = np.searchsorted(self.days, _to_day(end_date), side="right")
+        return slice(int(lo), int(hi))
+
+    def category_totals(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        account_name: Optional[str] = None
+    ) -> List[Tuple[int, int, int, Optional[float], float]]:
+        """
+        (category_id, transaction_count, expense_count, income, expenses) per
+        kategori med transaktioner i intervallet, i kategoriordning. income är
+        None om kategorin saknar inkomster (som SUM i SQL), expenses är positivt.
+        """
+        rows = self.date_slice(start_date, end_date)
+        keys = self.keys[rows]
+        amounts = self.amounts[rows]
+
+        if account_name is not None:
+            if account_name not in self.account_names:
+                return []
+            in_account = self.accounts[rows] == self.account_names.index(account_name)
+            keys = keys[in_account]
+            amounts = amounts[in_account]
+
+        if not len(keys):
+            return []
+
+        # Två pass över raderna i stället för ett per mått (antal, inkomst, utgift, antal utgifter).
+        # Vikterna summeras som float64, exakt för heltal upp till 2^53 ören.
+        counts = np.bincount(keys)
+        sums = np.bincount(keys, weights=amounts, minlength=len(counts))
+        if len(counts) % 2:
+            counts = np.append(counts, 0)
+            sums = np.append(sums, 0.0)
+        sums = sums.round().astype(np.int64).tolist()
+
+        totals = []
+        for category_id in np.flatnonzero(counts[0::2] + counts[1::2]):
+            income_count, expense_count = int(counts[2 * category_id]), int(counts[2 * category_id + 1])
+            totals.append((
+                int(category_id),
+                income_count + expense_count,
+                expense_count,
+                sums[2 * category_id] / 100 if income_count else None,
+                -sums[2 * category_id + 1] / 100,
+            ))
+        return totals
+
+
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_columns: Optional[TransactionColumns] = None
+
+# Version då tabellen senast var över budget, kollas igen först när den ändrats
+_over_budget_version: Optional[int] = None
+
+# Räknas upp vid varje commit som ändrar transactions. Ändrade id:n samlas
+# tills nästa läsning, en full omläsning behövs bara när id:na är okända.
+_changes_version = 0
+_changed_ids: Set[int] = set()
+_reload = False
+
+
+def get_transaction_columns(db: Session) -> Optional[TransactionColumns]:
+    """
+    Aktuell ögonblicksbild, laddas första gången och uppdateras med de rader
+    som ändrats sedan förra anropet. None om tabellen är större än
+    MEMORY_BUDGET_MB, då får anroparen fråga databasen.
+    """
+    global _columns, _changed_ids, _reload, _over_budget_version
+
+    columns = _columns
+    if columns is not None and columns.version == _changes_version:
+        return columns
+    if columns is None and _over_budget_version == _changes_version:
+        return None
+
+    with _refresh_lock:
+        with _lock:
+            version = _changes_version
+            changed, _changed_ids = _changed_ids, set()
+            reload, _reload = _reload, False
+
+        columns = _columns
+        if columns is not None and columns.version == version:
+            return columns
+
+        if columns is None or reload:
+            columns = _load(db, version)
+        else:
+            columns = _apply_changes(db, columns, version, changed)
+
+        _columns = columns
+        if columns is None:
+            _over_budget_version = version
+            with _lock:
+                _reload = True
+        return columns
+
+
+def forget_transaction_columns():
+    """Släpp ögonblicksbilden (laddas om vid nästa användning)"""
+    global _columns
+    with _refresh_lock:
+        _columns = None
+
+
+def _column_query():
+    # Dagnumret räknas i SQLite, att tolka en miljon datumsträngar i Python tar sekunder
+    day = cast(func.julianday(Transaction.date) - _UNIX_EPOCH_JULIAN_DAY, Integer)
+    return select(
+        Transaction.id, day, stored_expression(Transaction.amount), Transaction.category_id, Transaction.account_name
+    )
+
+
+def _load(db: Session, version: int) -> Optional[TransactionColumns]:
+    count = db.execute(select(func.count(Transaction.id))).scalar()
+    if count * BYTES_PER_ROW > MEMORY_BUDGET_MB * 1024 * 1024:
+        return None
+
+    # Sorteringen görs i NumPy, ORDER BY date läser tabellen i indexordning (slumpvis)
+    rows = db.connection().execute(_column_query()).all()
+    account_names: List[str] = []
+    return _sorted_columns(version, _to_arrays(rows, account_names), account_names)
+
+
+def _apply_changes(db: Session, columns: TransactionColumns, version: int, changed: Set[int]) -> Optional[TransactionColumns]:
+    """Ny bild med ändrade rader inlästa på nytt och nya rader (id > max_id) tillagda"""
+    query = _column_query()
+    rows = db.connection().execute(query.where(Transaction.id > columns.max_id)).all()
+    changed = sorted(transaction_id for transaction_id in changed if transaction_id <= columns.max_id)
+    for i in range(0, len(changed), FETCH_CHUNK_SIZE):
+        rows += db.connection().execute(query.where(Transaction.id.in_(changed[i:i + FETCH_CHUNK_SIZE]))).all()
+
+    if (len(columns) + len(rows)) * BYTES_PER_ROW > MEMORY_BUDGET_MB * 1024 * 1024:
+        return None
+
+    account_names = list(columns.account_names)
+    ids, days, amounts, category_ids, accounts = _to_arrays(rows, account_names)
+
+    # Ändrade rader som finns i bilden (borttagna rader saknas i rows och försvinner)
+    changed_ids = np.asarray(changed, dtype=np.int32)
+    sorted_ids = columns.ids[columns.id_order]
+    found = np.searchsorted(sorted_ids, changed_ids)
+    found = found[(found < len(sorted_ids)) & (sorted_ids[np.minimum(found, len(sorted_ids) - 1)] == changed_ids)]
+    positions = columns.id_order[found]
+
+    if len(positions) == len(ids) and ids.max(initial=0) <= columns.max_id:
+        # Bara ändrade värden på samma rader: byt ut dem om datumen är oförändrade
+        order = np.argsort(ids)
+        if np.array_equal(columns.ids[positions], ids[order]) and np.array_equal(columns.days[positions], days[order]):
+            patched = [column.copy() for column in (columns.amounts, columns.category_ids, columns.accounts)]
+            for column, values in zip(patched, (amounts, category_ids, accounts)):
+                column[positions] = values[order]
+            return TransactionColumns(version, columns.ids, columns.days, *patched, account_names, columns.id_order)
+
+    keep = np.ones(len(columns), dtype=bool)
+    keep[positions] = False
+    merged = [
+        np.concatenate((old[keep], new))
+        for old, new in zip(
+            (columns.ids, columns.days, columns.amounts, columns.category_ids, columns.accounts),
+            (ids, days, amounts, category_ids, accounts)
+        )
+    ]
+    return _sorted_columns(version, merged, account_names)
+
+
+def _sorted_columns(version: int, arrays, account_names: List[str]) -> TransactionColumns:
+    ids, days = arrays[0], arrays[1]
+    order = np.lexsort((ids, days))
+    return TransactionColumns(version, *(column[order] for column in arrays), account_names)
+
+
+def _to_arrays(rows, account_names: List[str]) -> Tuple[np.ndarray, ...]:
+    account_codes = {name: code for code, name in enumerate(account_names)}
+
+    def account_code(name):
+        code = account_codes.get(name)
+        if code is None:
+            code = account_codes[name] = len(account_names)
+            account_names.append(name)
+        return code
+
+    count = len(rows)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int32, count=count)
+    days = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+    if STORED_IN_ORE:
+        amounts = np.fromiter((row[2] for row in rows), dtype=np.int64, count=count)
+    else:
+        # Avrundas som to_ore (till jämnt), snabbare här än ROUND per rad i SQLite
+        amounts = np.rint(np.fromiter((row[2] for row in rows), dtype=np.float64, count=count) * 100).astype(np.int64)
+    category_ids = np.fromiter((row[3] or 0 for row in rows), dtype=np.int32, count=count)
+    accounts = np.fromiter((account_code(row[4]) for row in rows), dtype=np.int16, count=count)
+    return ids, days, amounts, category_ids, accounts
+
+
+def _to_day(value: datetime) -> int:
+    return (value - _EPOCH).days
+
+
+def _from_day(day: int) -> datetime:
+    return _EPOCH + timedelta(days=day)
+
+
+def install_column_hooks():
+    """
+    Samla id:n för transaktioner som ändras eller tas bort, via ORM (mapper-
+    händelser) och bulk-UPDATE/DELETE via session.execute. Nya rader behöver
+    inga id:n, de läses som id > max_id. Ändringarna publiceras vid commit.
+    Spårningen är på från start: en session kan skriva innan bilden laddas
+    och committa efteråt.
+    """
+    if event.contains(Session, "after_commit", _publish_changes):
+        return
+    event.listen(Transaction, "after_insert", _record_insert)
+    event.listen(Transaction, "after_update", _record_row)
+    event.listen(Transaction, "after_delete", _record_row)
+    event.listen(Session, "do_orm_execute", _record_bulk)
+    event.listen(Session, "after_commit", _publish_changes)
+    event.listen(Session, "after_rollback", _discard_changes)
+
+
+def _pending(session: Session) -> Dict:
+    return session.info.setdefault(_PENDING_KEY, {"ids": set(), "reload": False})
+
+
+def record_transaction_changes(session: Session, ids: Iterable[int]):
+    """Id:n som en bulk-skrivning med IDS_RECORDED_OPTION ändrade eller tog bort"""
+    _pending(session)["ids"].update(ids)
+
+
+def _record_insert(mapper, connection, target):
+    _pending(object_session(target))
+
+
+def _record_row(mapper, connection, target):
+    _pending(object_session(target))["ids"].add(target.id)
+
+
+def _record_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is None or table.name != Transaction.__tablename__:
+        return
+
+    pending = _pending(orm_execute_state.session)
+    if orm_execute_state.is_insert or orm_execute_state.execution_options.get(IDS_RECORDED_OPTION):
+        return
+
+    # Raderna som träffas läses före ändringen, efteråt kan villkoret ha slutat matcha
+    where = orm_execute_state.statement.whereclause
+    if where is None:
+        pending["reload"] = True
+        return
+    ids = orm_execute_state.session.execute(select(Transaction.__table__.c.id).where(where)).scalars()
+    pending["ids"].update(ids)
+
+
+def _publish_changes(session: Session):
+    global _changes_version, _reload
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending is None:
+        return
+    with _lock:
+        if _columns is None:
+            # Ingen bild (eller en som laddas just nu): nästa läsning laddar allt
+            _reload = True
+        else:
+            _changed_ids.update(pending["ids"])
+            _reload = _reload or pending["reload"]
+        _changes_version += 1
+
+
+def _discard_changes(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Sequence
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from models.database import Category, Transaction, TransactionSuggestion
+
+
+# SQLite tillåter ett begränsat antal parametrar per fråga
+SUGGESTION_CHUNK_SIZE = 500
+
+_TRANSACTION_COLUMNS = (
+    Transaction.date,
+    Transaction.description,
+    Transaction.amount,
+    Transaction.balance,
+    Transaction.category_id,
+    Transaction.account_name,
+    Transaction.id,
+    Transaction.import_hash,
+    Transaction.is_manually_categorized,
+    Transaction.created_at,
+    Transaction.updated_at,
+)
+
+_CATEGORY_COLUMNS = (
+    Category.name,
+    Category.type,
+    Category.budget_limit,
+    Category.color,
+    Category.id,
+    Category.created_at,
+)
+
+
+def transaction_list_query() -> Select:
+    """
+    Kolumnerna som listorna returnerar, med kategorin i samma fråga (outer join)
+    Filter och sortering läggs på av anroparen som på select(Transaction).
+    """
+    return (
+        select(*_TRANSACTION_COLUMNS, *_CATEGORY_COLUMNS)
+        .outerjoin(Category, Category.id == Transaction.category_id)
+    )
+
+
+def fetch_transaction_list(db: Session, query: Select) -> List[Dict[str, Any]]:
+    """
+    Kör en transaction_list_query och bygg svaren som dicts i samma form som
+    schemas.Transaction (samma nycklar och ordning), utan ORM-objekt och
+    pydantic-validering. Förslagen hämtas i en fråga för okategoriserade rader.
+    """
+    # Direkt mot anslutningen: kolumnrader behöver inte ORM-lagrets radhantering (~40 % snabbare)
+    rows = db.connection().execute(query).all()
+    suggestions = _fetch_suggestions(db, [row[6] for row in rows if row[4] is None])
+
+    return [_transaction_dict(row, suggestions) for row in rows]
+
+
+def _fetch_suggestions(db: Session, transaction_ids: Sequence[int]) -> Dict[int, List[Dict[str, Any]]]:
+    suggestions: Dict[int, List[Dict[str, Any]]] = {}
+    for i in range(0, len(transaction_ids), SUGGESTION_CHUNK_SIZE):
+        rows = db.connection().execute(
+            select(TransactionSuggestion.transaction_id, TransactionSuggestion.category_id, TransactionSuggestion.score)
+            .where(TransactionSuggestion.transaction_id.in_(transaction_ids[i:i + SUGGESTION_CHUNK_SIZE]))
+            .order_by(TransactionSuggestion.transaction_id, TransactionSuggestion.rank)
+        )
+        for transaction_id, category_id, score in rows:
+            suggestions.setdefault(transaction_id, []).append({"category_id": category_id, "score": score})
+    return suggestions
+
+
+def _transaction_dict(row, suggestions: Dict[int, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    (date, description, amount, balance, category_id, account_name, transaction_id, import_hash,
+     is_manually_categorized, created_at, updated_at,
+     category_name, category_type, budget_limit, color, joined_category_id, category_created_at) = row
+
+    category = None
+    if joined_category_id is not None:
+        category = {
+            "name": category_name,
+            "type": category_type,
+            "budget_limit": budget_limit,
+            "color": color,
+            "id": joined_category_id,
+            "created_at": category_created_at,
+        }
+
+    return {
+        "date": date,
+        "description": description,
+        "amount": amount,
+        "balance": balance,
+        "category_id": category_id,
+        "account_name": account_name,
+        "id": transaction_id,
+        "import_hash": import_hash,
+        "is_manually_categorized": is_manually_categorized,
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "category": category,
+        "suggestions": suggestions.get(transaction_id, []),
+    }
@@ -17,6 +17,9 @@ export default function Transactions() {
   const [selectedTransactions, setSelectedTransactions] = useState<Set<number>>(new Set());
   const [bulkCategoryId, setBulkCategoryId] = useState<number | null>(null);
 
+  // Förslagen innehåller bara category_id
+  const categoriesById = new Map(categories.map((cat) => [cat.id, cat]));
+
   useEffect(() => {
     loadInitialData();
   }, []);
@@ -384,26 +387,52 @@ export default function Transactions() {
                       ))}
                     </select>
                   ) : (
-                    <button
-                      onClick={() => {
-                        setEditingId(transaction.id);
-                        setSelectedCategory(transaction.category_id);
-                      }}
-                      className="flex items-center space-x-2 hover:text-blue-600"
-                    >
-                      {transaction.category ? (
-                        <>
-                          <span
-                            className="w-3 h-3 rounded"
-                            style={{ backgroundColor: transaction.category.color || '#94a3b8' }}
-                          />
-                          <span>{transaction.category.name}</span>
-                        </>
-                      ) : (
-                        <span className="text-gray-400">Okategoriserad</span>
+                    <>
+                      <button
+                        onClick={() => {
+                          setEditingId(transaction.id);
+                          setSelectedCategory(transaction.category_id);
+                        }}
+                        className="flex items-center space-x-2 hover:text-blue-600"
+                      >
+                        {transaction.category ? (
+                          <>
+                            <span
+                              className="w-3 h-3 rounded"
+                              style={{ backgroundColor: transaction.category.color || '#94a3b8' }}
+                            />
+                            <span>{transaction.category.name}</span>
+                          </>
+                        ) : (
+                          <span className="text-gray-400">Okategoriserad</span>
+                        )}
+                        <Edit2 size={14} className="opacity-0 group-hover:opacity-100" />
+                      </button>
+                      {!transaction.category && transaction.suggestions && transaction.suggestions.length > 0 && (
+                        <div className="mt-1 flex flex-wrap gap-1">
+                          {transaction.suggestions.map((suggestion) => {
+                            const category = categoriesById.get(suggestion.category_id);
+                            if (!category) {
+                              return null;
+                            }
+                            return (
+                              <button
+                                key={suggestion.category_id}
+                                onClick={() => handleUpdateCategory(transaction.id, suggestion.category_id)}
+                                title={`Förslag (${Math.round(suggestion.score * 100)} %)`}
+                                className="flex items-center space-x-1 px-2 py-0.5 rounded-full border border-gray-300 text-xs text-gray-600 hover:border-blue-500 hover:text-blue-600"
+                              >
+                                <span
+                                  className="w-2 h-2 rounded"
+                                  style={{ backgroundColor: category.color || '#94a3b8' }}
+                                />
+                                <span>{category.name}</span>
+                              </button>
+                            );
+                          })}
+                        </div>
                       )}
-                      <Edit2 size={14} className="opacity-0 group-hover:opacity-100" />
-                    </button>
+                    </>
                   )}
                 </td>
                 <td className={`px-6 py-4 whitespace-nowrap text-sm text-right font-medium ${
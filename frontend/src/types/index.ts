@@ -7,6 +7,11 @@ export interface Category {
   created_at: string;
 }
 
+export interface CategorySuggestion {
+  category_id: number;
+  score: number;
+}
+
 export interface Transaction {
   id: number;
   date: string;
@@ -20,6 +25,7 @@ export interface Transaction {
   created_at: string;
   updated_at: string;
   category?: Category;
+  suggestions?: CategorySuggestion[];
 }
 
 export interface PeriodSummary {
@@ -49,6 +55,21 @@ export interface ImportResponse {
   duplicates: number;
   errors: number;
   message: string;
+  timings?: Record<string, number>;
+}
+
+export interface Job {
+  id: number;
+  kind: 'import' | 'auto_categorize';
+  status: 'queued' | 'running' | 'done' | 'failed';
+  total_rows: number | null;
+  processed_rows: number;
+  rows_per_second: number | null;
+  result: Record<string, unknown> | null;
+  error: string | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
 }
 
 export interface Loan {